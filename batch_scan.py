@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import pytesseract
+
+from ocr_engine import ENGINE_ORDER, configure_tesseract
+from pipeline import FramePipeline
+from recording import ReplaySource, is_recording
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+IMAGES_PER_JOB = 64
+POLL_INTERVAL = 1.0
+_DONE = "__done__"
+
+
+def is_camera_index(source):
+    return isinstance(source, int) or (isinstance(source, str) and source.isdigit())
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def iter_frames(source, stride=1, first_index=0):
+    # Yields (name, frame_id, frame) from a camera index, a video file, an
+    # image directory, a session recording or an explicit list of image paths.
+    # first_index is the position of the first path of a list in its folder,
+    # so chunks of a folder keep the stride and frame ids of the whole folder.
+    stride = max(1, int(stride))
+    if is_recording(source):
+        replay = ReplaySource(source, speed=None)
+        try:
+            for index, (seq, _, frame) in enumerate(replay.frames()):
+                if index % stride == 0:
+                    yield source, seq, frame
+        finally:
+            replay.release()
+        return
+    if isinstance(source, (list, tuple)) or (isinstance(source, str) and os.path.isdir(source)):
+        paths = source if isinstance(source, (list, tuple)) else list_images(source)
+        for index, path in enumerate(paths, first_index):
+            if index % stride:
+                continue
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield path, index, frame
+        return
+
+    cap = cv2.VideoCapture(int(source) if is_camera_index(source) else source)
+    if not cap.isOpened():
+        raise IOError(f"Failed to open video source: {source}")
+    name = str(source)
+    try:
+        frame_id = 0
+        while True:
+            # grab() skips the color conversion of frames we are not going to analyze
+            if frame_id % stride:
+                if not cap.grab():
+                    break
+                frame_id += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield name, frame_id, frame
+            frame_id += 1
+    finally:
+        cap.release()
+
+
+def scan_recording(path, stride=1, pipeline=None, speed=None, **pipeline_options):
+    # Replays a session recording with its recorded timestamps and weight
+    # readings, so every run over the same recording gives the same results.
+    # speed None runs as fast as possible, 1.0 at the recorded pace.
+    stride = max(1, int(stride))
+    replay = ReplaySource(path, speed=speed)
+    if pipeline is None:
+        if pipeline_options.get("weight_fn") is None:
+            pipeline_options = dict(pipeline_options, weight_fn=replay.current_weight)
+        pipeline = FramePipeline(**pipeline_options)
+    try:
+        for index, (seq, timestamp, frame) in enumerate(replay.frames()):
+            if index % stride:
+                continue
+            result = pipeline.analyze(frame, frame_id=seq, timestamp=timestamp)
+            if result is not None:
+                result["source"] = path
+                yield result
+    finally:
+        replay.release()
+
+
+def scan_source(source, stride=1, pipeline=None, speed=None, first_index=0, **pipeline_options):
+    # Generator over the analysis results of one source
+    if is_recording(source):
+        yield from scan_recording(source, stride, pipeline, speed, **pipeline_options)
+        return
+    if pipeline is None:
+        if isinstance(source, (list, tuple)) or (isinstance(source, str) and os.path.isdir(source)):
+            # Still images are unrelated to each other, so never gate between them
+            pipeline_options = dict(pipeline_options, change_threshold=None)
+        pipeline = FramePipeline(**pipeline_options)
+    for name, frame_id, frame in iter_frames(source, stride, first_index):
+        result = pipeline.analyze(frame, frame_id=frame_id)
+        if result is not None:
+            result["source"] = name
+            yield result
+
+
+def expand_sources(sources):
+    # Splits image directories into chunks so they can be spread over workers.
+    # Returns (source, first_index) pairs, first_index being the position of
+    # a chunk's first image in its folder.
+    units = []
+    for source in sources:
+        if isinstance(source, str) and os.path.isdir(source) and not is_recording(source):
+            paths = list_images(source)
+            units.extend((paths[i:i + IMAGES_PER_JOB], i) for i in range(0, len(paths), IMAGES_PER_JOB))
+        else:
+            units.append((source, 0))
+    return units
+
+
+def _scan_worker(source, first_index, stride, speed, pipeline_options, results_queue, tesseract_cmd):
+    configure_tesseract(tesseract_cmd)
+    try:
+        for result in scan_source(source, stride, speed=speed, first_index=first_index, **pipeline_options):
+            results_queue.put(result)
+    finally:
+        results_queue.put(_DONE)
+
+
+def scan_sources(sources, stride=1, jobs=1, speed=None, **pipeline_options):
+    # Generator over the results of several sources. With jobs > 1 the files
+    # are decoded and analyzed in parallel worker processes; results arrive
+    # in the order they are produced. speed only applies to recordings.
+    if jobs <= 1:
+        for source in sources:
+            yield from scan_source(source, stride, speed=speed, **pipeline_options)
+        return
+
+    import multiprocessing
+
+    units = expand_sources(sources)
+    cameras = [source for source, _ in units if is_camera_index(source)]
+    units = [unit for unit in units if not is_camera_index(unit[0])]
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=jobs) as executor:
+        results_queue = manager.Queue(maxsize=1024)
+        futures = [
+            executor.submit(_scan_worker, source, first_index, stride, speed, pipeline_options, results_queue,
+                            pytesseract.pytesseract.tesseract_cmd)
+            for source, first_index in units
+        ]
+        remaining = len(futures)
+        while remaining:
+            try:
+                result = results_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # A worker process that dies never sends _DONE, so check the
+                # futures instead of waiting for it forever
+                for future in futures:
+                    if future.done() and isinstance(future.exception(), BrokenProcessPool):
+                        raise future.exception()
+                if all(future.done() for future in futures) and results_queue.empty():
+                    break
+                continue
+            if result == _DONE:
+                remaining -= 1
+            else:
+                yield result
+        for future in futures:
+            future.result()  # Re-raise worker errors
+    # Live cameras cannot be split up, scan them last in this process
+    for camera in cameras:
+        yield from scan_source(camera, stride, **pipeline_options)
+
+
+def write_jsonl(results, output):
+    # Writes each result as soon as it is produced; returns the number written
+    count = 0
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan video files, image folders or cameras without the GUI.")
+    parser.add_argument("sources", nargs="+", help="video file, image directory, session recording or camera index")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--stride", type=int, default=1, help="analyze every Nth frame")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay speed of session recordings: 1.0 = recorded pace, 0 = as fast as possible")
+    parser.add_argument("--jobs", type=int, default=1, help="number of files to process in parallel")
+    parser.add_argument("--change-threshold", type=float, default=None,
+                        help="skip video frames that changed less than this (mean pixel difference)")
+    parser.add_argument("--no-ocr", action="store_true", help="skip text extraction")
+    parser.add_argument("--no-qr", action="store_true", help="skip QR decoding")
+    parser.add_argument("--no-color", action="store_true", help="skip color detection")
+    parser.add_argument("--weight-port", default=None, help="serial port of the scale to tag results with")
+    parser.add_argument("--weight-mode", choices=["poll", "stream"], default="poll")
+    parser.add_argument("--weight-command", default="W", help="command byte that requests a reading in poll mode")
+    parser.add_argument("--tesseract-cmd", default=None, help="path to the tesseract executable (default: search)")
+    parser.add_argument("--ocr-engine", choices=ENGINE_ORDER, default=None,
+                        help="OCR backend (default: the first available of " + ", ".join(ENGINE_ORDER) + ")")
+    args = parser.parse_args(argv)
+
+    configure_tesseract(args.tesseract_cmd)
+    if args.ocr_engine:
+        # Read by every worker process when it creates its engine
+        os.environ["OCR_ENGINE"] = args.ocr_engine
+
+    pipeline_options = {
+        "ocr": not args.no_ocr,
+        "qr": not args.no_qr,
+        "color": not args.no_color,
+        "change_threshold": args.change_threshold,
+    }
+    if args.weight_port:
+        if args.jobs > 1:
+            parser.error("--weight-port cannot be combined with --jobs")
+        from weight_reader import WeightReader
+
+        weight_reader = WeightReader(args.weight_port, mode=args.weight_mode,
+                                     command=args.weight_command.encode('ascii')).start()
+        pipeline_options["weight_fn"] = lambda: weight_reader.latest_weight(max_age=5.0)
+
+    start_time = time.time()
+    results = scan_sources(args.sources, stride=args.stride, jobs=args.jobs, speed=args.speed, **pipeline_options)
+    if args.output == "-":
+        count = write_jsonl(results, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            count = write_jsonl(results, output)
+    elapsed_time = time.time() - start_time
+    print(f"Scanned {count} frames in {elapsed_time:.2f} sec", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+STAGES = ["text_regions", "extract_text", "extract_text_pytesseract", "detect_qr_codes",
+          "detect_color", "detect_color_reference", "display_frame", "handoff_queue", "handoff_ring"]
+
+
+def synthetic_frame(width, height, seed=0, qr_text="https://example.com/item/0042"):
+    # Deterministic frame with a textured background, color patches, two lines
+    # of text and a QR code, scaled to the resolution
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(150, 200, (height, width, 3), dtype=np.uint8)
+    unit = width / 640.0
+
+    patches = [(0, 0, 200), (0, 180, 0), (200, 0, 0), (0, 200, 230), (0, 120, 240), (40, 40, 40)]
+    patch = int(50 * unit)
+    for index, color in enumerate(patches):
+        x = int(20 * unit) + index * (patch + int(10 * unit))
+        cv2.rectangle(frame, (x, height - patch - int(20 * unit)), (x + patch, height - int(20 * unit)), color, -1)
+
+    cv2.putText(frame, "LOT 48213 EXP 2027-03", (int(20 * unit), int(60 * unit)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9 * unit, (10, 10, 10), max(1, int(2 * unit)))
+    cv2.putText(frame, "NET WT 500 g", (int(20 * unit), int(110 * unit)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9 * unit, (10, 10, 10), max(1, int(2 * unit)))
+
+    qr_size = int(160 * unit)
+    if hasattr(cv2, "QRCodeEncoder"):
+        code = cv2.QRCodeEncoder.create().encode(qr_text)
+    else:
+        # QR-like pattern with finder squares when the encoder is not available
+        code = (rng.random((25, 25)) > 0.5).astype(np.uint8) * 255
+        for y, x in [(0, 0), (0, 18), (18, 0)]:
+            code[y:y + 7, x:x + 7] = 0
+            code[y + 1:y + 6, x + 1:x + 6] = 255
+            code[y + 2:y + 5, x + 2:x + 5] = 0
+        code = cv2.copyMakeBorder(code, 4, 4, 4, 4, cv2.BORDER_CONSTANT, value=255)
+    code = cv2.resize(code, (qr_size, qr_size), interpolation=cv2.INTER_NEAREST)
+    x, y = width - qr_size - int(30 * unit), int(30 * unit)
+    frame[y:y + qr_size, x:x + qr_size] = cv2.cvtColor(code, cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+def _queue_echo_worker(requests, replies):
+    # Receives pickled frames and answers with one pixel so the frame is really read
+    while True:
+        frame = requests.get()
+        if frame is None:
+            break
+        replies.put(int(frame[-1, -1, 0]))
+
+
+def _ring_echo_worker(ring, requests, replies):
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        slot, seq = message
+        frame = ring.view(slot, seq)
+        value = int(frame[-1, -1, 0])
+        del frame
+        ring.release(slot)
+        replies.put(value)
+    ring.close()
+
+
+class _Handoff:
+    # Round trip of one frame to a worker process and back, either pickled
+    # through a multiprocessing queue or through a shared memory FrameRing
+    def __init__(self, use_ring):
+        import multiprocessing
+
+        self.use_ring = use_ring
+        self.context = multiprocessing.get_context("spawn")
+        self.ring = None
+        self.process = None
+
+    def _start(self, frame):
+        from frame_ring import FrameRing
+
+        self.stop()
+        self.requests = self.context.Queue()
+        self.replies = self.context.Queue()
+        if self.use_ring:
+            self.ring = FrameRing(slots=2, slot_bytes=frame.nbytes, context=self.context)
+            args = (self.ring, self.requests, self.replies)
+            target = _ring_echo_worker
+        else:
+            args = (self.requests, self.replies)
+            target = _queue_echo_worker
+        self.process = self.context.Process(target=target, args=args, daemon=True)
+        self.process.start()
+
+    def __call__(self, frame):
+        # A new worker (and ring size) per resolution, the warmup runs absorb the start
+        if self.process is None or (self.use_ring and self.ring.slot_bytes != frame.nbytes):
+            self._start(frame)
+        if self.use_ring:
+            self.requests.put(self.ring.write(frame, refs=1))
+        else:
+            self.requests.put(frame)
+        return self.replies.get()
+
+    def stop(self):
+        if self.process is not None:
+            self.requests.put(None)
+            self.process.join(timeout=5.0)
+            self.process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+
+
+def _stage_functions():
+    # Each entry builds the callable for one stage, or raises when its
+    # dependencies are missing so the stage is reported as skipped
+    def text_regions():
+        from text_regions import find_text_regions
+        return lambda frame: find_text_regions(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+    def _extract_text(engine):
+        from ocr_pool import ocr_regions
+        from text_regions import crop_regions, find_text_regions
+
+        def run(frame):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            return ocr_regions(crop_regions(gray, find_text_regions(gray)), engine)
+        return run
+
+    def extract_text():
+        # The persistent engine the OCR workers use
+        from ocr_engine import configure_tesseract, get_engine
+        configure_tesseract()
+        return _extract_text(get_engine())
+
+    def extract_text_pytesseract():
+        # One tesseract process per region, for comparison
+        from ocr_engine import PytesseractEngine, configure_tesseract
+        configure_tesseract()
+        return _extract_text(PytesseractEngine())
+
+    def detect_qr_codes():
+        from qr_scanner import QRScanner
+        scanner = QRScanner(full_search_every=1)
+        return lambda frame: scanner.scan(frame)
+
+    def detect_color():
+        from color_lut import ColorClassifier
+        return ColorClassifier(downsample=2).dominant_color
+
+    def detect_color_reference():
+        from color_lut import reference_color_counts
+        return reference_color_counts
+
+    def display_frame():
+        # The preview path of the apps, into a real Tk label when there is a
+        # display. Without one only the paste into the PhotoImage is left out.
+        import tkinter as tk
+        from preview import PreviewRenderer
+
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            return PreviewRenderer(None, size=(400, 150), max_fps=None).draw
+        label = tk.Label(root)
+        label.pack()
+        root.update()
+        renderer = PreviewRenderer(label, size=(400, 150), max_fps=None)
+        if not renderer.render(synthetic_frame(640, 480)):
+            root.destroy()
+            raise RuntimeError("the preview window is not visible")
+
+        def run(frame):
+            renderer.render(frame)
+            root.update_idletasks()
+        return run
+
+    def handoff_queue():
+        return _Handoff(use_ring=False)
+
+    def handoff_ring():
+        return _Handoff(use_ring=True)
+
+    return {
+        "text_regions": text_regions,
+        "extract_text": extract_text,
+        "extract_text_pytesseract": extract_text_pytesseract,
+        "detect_qr_codes": detect_qr_codes,
+        "detect_color": detect_color,
+        "detect_color_reference": detect_color_reference,
+        "display_frame": display_frame,
+        "handoff_queue": handoff_queue,
+        "handoff_ring": handoff_ring,
+    }
+
+
+# Runs in a fresh interpreter so that imports and analyzer set-up are cold.
+# "cold" analyzes the first frame right away, "warm" starts the background
+# warm-up first and gives it the time a camera needs to open. OCR counts
+# until its callback ran, as the app sees it. Analyzers that cannot load are
+# reported as skipped and left out of first_result_ms.
+_STARTUP_SCRIPT = """
+import json, os, sys, tempfile, time
+start = time.perf_counter()
+import {module}
+import_ms = (time.perf_counter() - start) * 1000.0
+from benchmark import synthetic_frame
+from scanner_core import ScannerCore
+frame = synthetic_frame(1280, 720)
+with tempfile.TemporaryDirectory() as directory:
+    start = time.perf_counter()
+    core = ScannerCore(os.path.join(directory, "startup.db"), metrics_port=None)
+    core_ms = (time.perf_counter() - start) * 1000.0
+    warm_up_ms = None
+    if sys.argv[1] == "warm":
+        start = time.perf_counter()
+        core.warm_up()
+        core.wait_ready()
+        warm_up_ms = (time.perf_counter() - start) * 1000.0
+    def ocr():
+        done = []
+        future = core.submit_ocr(frame, done.append)
+        if future is None:
+            raise RuntimeError("OCR unavailable or no text found")
+        while not done:
+            core.dispatch_ocr()
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+            time.sleep(0.001)
+
+    first_ms, skipped = {{}}, {{}}
+    for name, analyze in [("qr", lambda: core.scan_qr(frame)),
+                          ("color", lambda: core.color_classifier.dominant_color(frame)),
+                          ("ocr", ocr)]:
+        start = time.perf_counter()
+        try:
+            analyze()
+        except Exception as e:
+            skipped[name] = f"{{type(e).__name__}}: {{e}}"
+        else:
+            first_ms[name] = (time.perf_counter() - start) * 1000.0
+    core.shutdown()
+print(json.dumps({{"import_ms": import_ms, "core_ms": core_ms, "warm_up_ms": warm_up_ms,
+                  "first_result_ms": sum(first_ms.values()), "skipped": skipped}}))
+"""
+
+
+def _startup_run(module, mode):
+    output = subprocess.check_output([sys.executable, "-c", _STARTUP_SCRIPT.format(module=module), mode],
+                                     cwd=os.path.dirname(os.path.abspath(__file__)), text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_startup(modules=("colordetector", "project1"), repeats=3):
+    # Median over fresh processes of: importing each app module, building the
+    # ScannerCore, and the latency of the first analyzed frame with and
+    # without the background warm-up. Creating the Tk window itself needs a
+    # display and is not included.
+    startup = {"import_ms": {}}
+    for module in modules:
+        runs = [_startup_run(module, "cold") for _ in range(repeats)]
+        startup["import_ms"][module] = float(np.median([run["import_ms"] for run in runs]))
+    cold = [_startup_run(modules[0], "cold") for _ in range(repeats)]
+    warm = [_startup_run(modules[0], "warm") for _ in range(repeats)]
+    startup["core_ms"] = float(np.median([run["core_ms"] for run in cold]))
+    startup["cold_first_result_ms"] = float(np.median([run["first_result_ms"] for run in cold]))
+    startup["warm_up_ms"] = float(np.median([run["warm_up_ms"] for run in warm]))
+    startup["warm_first_result_ms"] = float(np.median([run["first_result_ms"] for run in warm]))
+    skipped = {}
+    for run in cold + warm:
+        skipped.update(run["skipped"])
+    if skipped:
+        startup["skipped"] = skipped
+    return startup
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def measure(fn, frames, repeats, warmup=3, memory_runs=3):
+    for index in range(warmup):
+        fn(frames[index % len(frames)])
+    timings = []
+    for index in range(repeats):
+        frame = frames[index % len(frames)]
+        start = time.perf_counter()
+        fn(frame)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    # Separate pass, tracemalloc hooks every allocation and would slow the timed runs
+    tracemalloc.start()
+    for index in range(memory_runs):
+        fn(frames[index % len(frames)])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    mean = float(np.mean(timings))
+    return {
+        "runs": repeats,
+        "mean_ms": mean,
+        "p50_ms": percentile(timings, 50),
+        "p90_ms": percentile(timings, 90),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": float(np.max(timings)),
+        "fps": 1000.0 / mean if mean else None,
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(resolutions, stages, repeats, frames_per_resolution=4):
+    builders = _stage_functions()
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeats": repeats,
+        "results": {},
+        "skipped": {},
+    }
+    stage_fns = {}
+    for stage in stages:
+        try:
+            stage_fns[stage] = builders[stage]()
+        except Exception as e:
+            report["skipped"][stage] = str(e)
+
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        frames = [synthetic_frame(width, height, seed=seed) for seed in range(frames_per_resolution)]
+        report["results"][resolution] = {}
+        for stage, fn in stage_fns.items():
+            report["results"][resolution][stage] = measure(fn, frames, repeats)
+    for fn in stage_fns.values():
+        if isinstance(fn, _Handoff):
+            fn.stop()
+    return report
+
+
+def compare(report, baseline, tolerance=0.2):
+    # Returns a list of (resolution, stage, baseline_ms, current_ms) regressions
+    regressions = []
+    for resolution, stages in report["results"].items():
+        for stage, current in stages.items():
+            previous = baseline.get("results", {}).get(resolution, {}).get(stage)
+            if previous and current["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+                regressions.append((resolution, stage, previous["p50_ms"], current["p50_ms"]))
+    previous_startup = baseline.get("startup") or {}
+    for name, current in _flat_startup(report.get("startup") or {}).items():
+        previous = _flat_startup(previous_startup).get(name)
+        if previous and current > previous * (1 + tolerance):
+            regressions.append(("startup", name, previous, current))
+    return regressions
+
+
+def _flat_startup(startup):
+    values = {f"import_{module}": value for module, value in startup.get("import_ms", {}).items()}
+    values.update((name, value) for name, value in startup.items() if name not in ("import_ms", "skipped"))
+    return values
+
+
+def print_report(report):
+    print(f"{'resolution':<10} {'stage':<24} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'fps':>8} {'peak MB':>8}")
+    for resolution, stages in report["results"].items():
+        for stage, result in stages.items():
+            print(f"{resolution:<10} {stage:<24} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} "
+                  f"{result['p99_ms']:>9.2f} {result['fps']:>8.1f} {result['peak_memory_mb']:>8.1f}")
+    for stage, reason in report["skipped"].items():
+        print(f"skipped {stage}: {reason}")
+    for name, value in _flat_startup(report.get("startup") or {}).items():
+        print(f"{'startup':<10} {name:<24} {value:>9.2f} ms")
+    for analyzer, reason in (report.get("startup") or {}).get("skipped", {}).items():
+        print(f"skipped startup {analyzer}: {reason}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the per-frame analyzers on synthetic frames.")
+    parser.add_argument("--resolutions", default="vga,720p,1080p,4k",
+                        help="comma separated list of " + ", ".join(RESOLUTIONS))
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma separated list of " + ", ".join(STAGES))
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("-o", "--output", default=None, help="save the results as JSON")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--startup", action="store_true",
+                        help="also measure import time and the first result with and without warm-up")
+    parser.add_argument("--startup-repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    resolutions = [name.strip() for name in args.resolutions.split(",") if name.strip()]
+    stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    for name in resolutions:
+        if name not in RESOLUTIONS:
+            parser.error(f"unknown resolution: {name}")
+    for name in stages:
+        if name not in STAGES:
+            parser.error(f"unknown stage: {name}")
+
+    report = run_benchmarks(resolutions, stages, args.repeats)
+    if args.startup:
+        report["startup"] = measure_startup(repeats=args.startup_repeats)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(report, baseline, args.tolerance)
+        for resolution, stage, previous, current in regressions:
+            print(f"REGRESSION {resolution} {stage}: p50 {previous:.2f} ms -> {current:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+
+class FrameChangeGate:
+    # Cheap scene-change detector run before any analyzer. Each frame is shrunk
+    # to a tiny grayscale thumbnail and compared with the thumbnail of the last
+    # analyzed frame; only frames that differ by more than the threshold pass.
+    def __init__(self, threshold=6.0, size=(64, 36), force_every=None):
+        self.threshold = threshold      # Mean absolute difference on a 0-255 scale
+        self.size = size
+        self.force_every = force_every  # Analyze at least every N frames if set
+        self.reference = None
+        self.last_score = 0.0
+        self.since_analyzed = 0
+        self.analyzed_count = 0
+        self.skipped_count = 0
+
+    def thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Blur away sensor noise so it does not count as motion
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def motion_score(self, thumb):
+        if self.reference is None:
+            return float("inf")
+        return float(np.mean(cv2.absdiff(thumb, self.reference)))
+
+    def should_analyze(self, frame):
+        thumb = self.thumbnail(frame)
+        score = self.motion_score(thumb)
+        self.last_score = score
+        self.since_analyzed += 1
+        forced = self.force_every is not None and self.since_analyzed >= self.force_every
+        if score >= self.threshold or forced:
+            self.reference = thumb
+            self.since_analyzed = 0
+            self.analyzed_count += 1
+            return True
+        self.skipped_count += 1
+        return False
+
+    def reset(self):
+        self.reference = None
+        self.since_analyzed = 0
+        self.analyzed_count = 0
+        self.skipped_count = 0
+
+    def skip_rate(self):
+        total = self.analyzed_count + self.skipped_count
+        return self.skipped_count / total if total else 0.0
+
+    def summary(self):
+        return f"Frames analyzed: {self.analyzed_count}, skipped: {self.skipped_count} ({self.skip_rate():.0%} skipped)"
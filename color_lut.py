@@ -0,0 +1,164 @@
+import time
+
+import cv2
+import numpy as np
+
+# Palette in priority order. Each color is one or more inclusive HSV boxes,
+# using the same ranges ColorDetector always used.
+DEFAULT_PALETTE = [
+    ('Red', [((0, 50, 50), (10, 255, 255)), ((160, 50, 50), (180, 255, 255))]),
+    ('Green', [((35, 50, 50), (85, 255, 255))]),
+    ('Blue', [((100, 50, 50), (140, 255, 255))]),
+    ('Yellow', [((20, 50, 50), (30, 255, 255))]),
+    ('Orange', [((10, 100, 20), (25, 255, 255))]),
+    ('Purple', [((140, 50, 50), (160, 255, 255))]),
+    ('Brown', [((10, 100, 20), (20, 255, 200))]),
+    ('Black', [((0, 0, 0), (180, 255, 30))]),
+    ('White', [((0, 0, 200), (180, 30, 255))]),
+]
+
+HUE_BINS = 180  # OpenCV stores 8-bit hue as 0-179
+
+
+def _channel_classes(palette, channel):
+    # Splits 0-255 into the intervals between all range boundaries of a channel
+    # and returns a table mapping every value to its interval index.
+    edges = {0, 256}
+    for _, color_boxes in palette:
+        for lower, upper in color_boxes:
+            edges.add(max(0, lower[channel]))
+            edges.add(min(255, upper[channel]) + 1)
+    edges = sorted(edges)
+    table = np.zeros(256, dtype=np.uint8)
+    for index, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        table[start:end] = index
+    return table, edges[:-1]
+
+
+class ColorClassifier:
+    # Compiles the palette once into lookup tables. Saturation and value are
+    # folded into a single "SV cell" per pixel, and one 2D histogram over
+    # (hue, SV cell) counts every pixel in a single pass. A precomputed table
+    # then says which colors each (hue, SV cell) belongs to, so all color
+    # counts come out of one matrix product. Colors keep independent counts
+    # where ranges overlap (Orange/Brown, Red/Orange at H=10), exactly like the
+    # old per-color inRange masks; palette order decides ties and per-pixel
+    # labels. Buffers are reused between calls, so use one instance per thread.
+    # With downsample > 1 only every n-th pixel in each direction is counted:
+    # the counts are those of the smaller frame, about 1/n**2 of the full-frame
+    # counts, and the dominant color can differ for small or striped patches.
+    def __init__(self, palette=None, downsample=1):
+        self.palette = palette if palette is not None else DEFAULT_PALETTE
+        self.downsample = max(1, int(downsample))
+        self.names = [name for name, _ in self.palette]
+        self.buffers = {}
+        self._compile()
+
+    def _compile(self):
+        s_table, s_starts = _channel_classes(self.palette, 1)
+        v_table, v_starts = _channel_classes(self.palette, 2)
+        v_count = len(v_starts)
+        self.sv_cells = len(s_starts) * v_count
+        if self.sv_cells > 256:
+            raise ValueError("Too many saturation/value boundaries for an 8-bit SV cell")
+        # sv_cell = s_lut[s] + v_lut[v]
+        self.s_lut = (s_table * v_count).astype(np.uint8)
+        self.v_lut = v_table
+
+        # membership[hue * sv_cells + cell, color] is 1 when that cell is inside the color
+        hues = np.arange(HUE_BINS)
+        cell_s = np.repeat(np.array(s_starts), v_count)
+        cell_v = np.tile(np.array(v_starts), len(s_starts))
+        membership = np.zeros((HUE_BINS, self.sv_cells, len(self.palette)), dtype=np.float32)
+        for color_index, (_, color_boxes) in enumerate(self.palette):
+            for lower, upper in color_boxes:
+                in_hue = (hues >= lower[0]) & (hues <= upper[0])
+                in_sv = (cell_s >= lower[1]) & (cell_s <= upper[1]) & (cell_v >= lower[2]) & (cell_v <= upper[2])
+                membership[in_hue[:, None] & in_sv[None, :], color_index] = 1
+        self.membership = membership.reshape(-1, len(self.palette))
+
+        # label_table[hue, cell] is the first matching color in palette order, -1 for none
+        matched = membership.any(axis=2)
+        self.label_table = np.where(matched, membership.argmax(axis=2), -1).astype(np.int16)
+
+    def _buffers(self, shape):
+        buffers = self.buffers.get(shape)
+        if buffers is None:
+            height, width = shape
+            buffers = {
+                'hsv': np.empty((height, width, 3), dtype=np.uint8),
+                'channels': [np.empty((height, width), dtype=np.uint8) for _ in range(3)],
+                's_class': np.empty((height, width), dtype=np.uint8),
+                'sv_cell': np.empty((height, width), dtype=np.uint8),
+            }
+            self.buffers = {shape: buffers}
+        return buffers
+
+    def _hue_and_cells(self, frame):
+        if self.downsample > 1:
+            frame = cv2.resize(frame, None, fx=1.0 / self.downsample, fy=1.0 / self.downsample,
+                               interpolation=cv2.INTER_NEAREST)
+        buffers = self._buffers(frame.shape[:2])
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=buffers['hsv'])
+        hue, saturation, value = cv2.split(buffers['hsv'], buffers['channels'])
+        cv2.LUT(saturation, self.s_lut, dst=buffers['s_class'])
+        cv2.LUT(value, self.v_lut, dst=buffers['sv_cell'])
+        cv2.add(buffers['s_class'], buffers['sv_cell'], dst=buffers['sv_cell'])
+        return hue, buffers['sv_cell']
+
+    def count_colors(self, frame):
+        # Pixel count per color, only colors that were seen, in palette order
+        hue, sv_cell = self._hue_and_cells(frame)
+        histogram = cv2.calcHist([hue, sv_cell], [0, 1], None, [HUE_BINS, self.sv_cells],
+                                 [0, HUE_BINS, 0, self.sv_cells])
+        counts = histogram.reshape(-1).astype(np.float64) @ self.membership
+        return {name: int(count) for name, count in zip(self.names, counts) if count > 0}
+
+    def classify(self, frame):
+        # Per-pixel label map (index into self.names, -1 for unclassified)
+        hue, sv_cell = self._hue_and_cells(frame)
+        return self.label_table[hue, sv_cell]
+
+    def dominant_color(self, frame):
+        counts = self.count_colors(frame)
+        if not counts:
+            return None, counts
+        return max(counts, key=counts.get), counts
+
+
+def reference_color_counts(frame, palette=None):
+    # The original per-color inRange implementation, kept to check the lookup tables
+    hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    detected_colors = {}
+    for color_name, color_boxes in (palette if palette is not None else DEFAULT_PALETTE):
+        mask = None
+        for lower, upper in color_boxes:
+            box_mask = cv2.inRange(hsv_frame, np.array(lower), np.array(upper))
+            mask = box_mask if mask is None else cv2.bitwise_or(mask, box_mask)
+        color_detection = cv2.countNonZero(mask)
+        if color_detection > 0:
+            detected_colors[color_name] = color_detection
+    return detected_colors
+
+
+def _time_call(fn, frame, repeats):
+    fn(frame)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(frame)
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+    # Timing against the inRange loop; test_color_lut.py checks the counts.
+    # Only downsample 1 computes the same counts as the reference, so only its
+    # ratio is a like-for-like speedup. Downsample 2 and 4 count a quarter and
+    # a sixteenth of the pixels; their ratios include that reduced work.
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    reference_time = _time_call(reference_color_counts, frame, 10)
+    for downsample in (1, 2, 4):
+        lut_time = _time_call(ColorClassifier(downsample=downsample).count_colors, frame, 10)
+        note = "same counts" if downsample == 1 else f"counts 1/{downsample * downsample} of the pixels, not comparable"
+        print(f"1080p lookup table, downsample {downsample}: {lut_time * 1000:.1f} ms, "
+              f"{reference_time / lut_time:.1f}x the {reference_time * 1000:.1f} ms inRange loop ({note})")
@@ -1,88 +1,90 @@
 import tkinter as tk
 from tkinter import Label, Text, ttk, messagebox
 import cv2
-import pytesseract
-from PIL import Image, ImageTk
 import time
-from pyzbar import pyzbar
-import webbrowser
-import serial
-from fpdf import FPDF
-import numpy as np
 import os
+from frame_grabber import FrameGrabber
+from scanner_core import ScannerCore
+from session_store import EXPORT_FORMATS
+from ui_dispatcher import UIDispatcher, LogView, HistoryView
+from preview import PreviewRenderer
+from recording import ReplaySource, is_recording
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# The analyzers (pyzbar, Tesseract, the color tables, the scale) are imported
+# by ScannerCore on first use or by its background warm-up, not here
 
 class ColorDetector:
-    def __init__(self, text_output):
-        self.text_output = text_output
+    def __init__(self, log, core):
+        self.log = log
+        self.core = core
         self.detected_colors = {}
 
     def detect_color(self, frame):
-        hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-        color_ranges = {
-            'Red': [((0, 50, 50), (10, 255, 255)), ((160, 50, 50), (180, 255, 255))],
-            'Green': ((35, 50, 50), (85, 255, 255)),
-            'Blue': ((100, 50, 50), (140, 255, 255)),
-            'Yellow': ((20, 50, 50), (30, 255, 255)),
-            'Orange': ((10, 100, 20), (25, 255, 255)),
-            'Purple': ((140, 50, 50), (160, 255, 255)),
-            'Brown': ((10, 100, 20), (20, 255, 200)),
-            'Black': ((0, 0, 0), (180, 255, 30)),
-            'White': ((0, 0, 200), (180, 30, 255))
-        }
-
-        detected_colors = {}
-
-        for color_name, color_range in color_ranges.items():
-            if color_name == 'Red':
-                lower1, upper1 = color_range[0]
-                lower2, upper2 = color_range[1]
-
-                mask1 = cv2.inRange(hsv_frame, np.array(lower1), np.array(upper1))
-                mask2 = cv2.inRange(hsv_frame, np.array(lower2), np.array(upper2))
-
-                mask = cv2.bitwise_or(mask1, mask2)
-            else:
-                lower, upper = color_range
-                mask = cv2.inRange(hsv_frame, np.array(lower), np.array(upper))
-
-            color_detection = cv2.countNonZero(mask)
-            if color_detection > 0:
-                detected_colors[color_name] = color_detection
-
-        if detected_colors:
-            detected_color = max(detected_colors, key=detected_colors.get)
-            self.text_output.insert(tk.END, f"Detected color: {detected_color}\n")
+        detected_color, _ = self.core.color_classifier.dominant_color(frame)
+        if detected_color is not None:
+            self.log(f"Detected color: {detected_color}")
             self.detected_colors[detected_color] = self.detected_colors.get(detected_color, 0) + 1
+        return detected_color
 
 
 class VideoTextExtractorApp:
-    alreadyText = ""
-    
     def __init__(self, root):
         self.root = root
         self.root.title("Video Text Extractor and QR Scanner")
         self.root.geometry("900x600")
         self.cap = None
-        self.frame_count = 0
-        self.extracted_texts = []  # List to store all extracted texts
-        self.extracted_qrs = []    # List to store all extracted QR codes
+        self.grabber = None
+        # Only the most recent items stay in memory, the full history is in the session store
+        self.recent_limit = 200
+        # Session store, metrics, gate, scheduler and the lazily loaded analyzers
+        # Set record_dir to keep every session's frames and weights for replay
+        self.core = ScannerCore("scan_sessions.db", change_threshold=6.0, metrics_port=9108,
+                                weight_port='COM3', weight_mode="poll", record_dir=None, log=self.log)
+        self.metrics = self.core.metrics
         self.qr_url = ""
         self.product_scan_count = 0
         self.text_scan_count = 0
         self.qr_scan_count = 0  # Initialize qr_scan_count here
-        self.weight = 0.0
-        self.camera_index = 0
-        self.weight_port = 'COM3'
-        self.serial_connection = None
+        self.multi_scanner = None  # Set while several cameras are scanned at once
+        self.camera_color_times = {}  # Last recorded color per camera, recorded at 5 Hz like one camera
+        self.last_stats_update = 0.0
+        self.weight_error = None
         self.detected_colors = {}  # Dictionary to store detected colors and their counts
+        self.last_text_regions = []  # Bounding boxes of the latest OCR result, outlined on the preview
+        self.replay_speed = 1.0  # Speed of recordings entered as the camera, None plays as fast as possible
+        self.show_metrics_overlay = False
         self.create_widgets()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Widget updates are batched and applied at most 10 times per second
+        self.ui = UIDispatcher(self.root, LogView(self.text_output, max_lines=500), max_rate_hz=10)
+        # The preview is redrawn at most 15 times per second, independent of the analysis rate
+        self.preview = PreviewRenderer(self.video_label, size=(400, 150), max_fps=15, overlay_fn=self.preview_overlay,
+                                       boxes_fn=self.preview_boxes)
+        self.text_history = self.ui.add_history(HistoryView(self.text_list_label, maxlen=self.recent_limit))
+        self.qr_history = self.ui.add_history(HistoryView(self.qr_list_label, maxlen=self.recent_limit))
+        self.extracted_texts = self.text_history.items
+        self.extracted_qrs = self.qr_history.items
+        self.ui.start()
+        self.start_metrics()
+
         # Initialize ColorDetector
-        self.color_detector = ColorDetector(self.text_output)
+        self.color_detector = ColorDetector(self.log, self.core)
+        self.create_scheduler()
+        # Load the analyzers in the background while the window comes up
+        self.core.warm_up()
+
+    def create_scheduler(self):
+        # Target rate, priority and time budget per analyzer. Analyzers that
+        # overrun are slowed down automatically; QR skips frames older than 250 ms.
+        self.scheduler = self.core.scheduler
+        self.scheduler.add("qr", self.detect_qr_codes, rate_hz=15, priority=0, budget_ms=15.0, max_age=0.25)
+        self.scheduler.add("color", self.detect_color, rate_hz=5, priority=1, budget_ms=5.0)
+        self.scheduler.add("ocr_submit", self.extract_text, rate_hz=2, priority=2, budget_ms=10.0)
+        self.scheduler.add("weight", lambda frame: self.update_weight(), rate_hz=1, priority=3,
+                           needs_change=False, adaptive=False)
+        self.scheduler.add("status", lambda frame: self.update_status(), rate_hz=1, priority=4,
+                           needs_change=False, adaptive=False)
 
     def create_widgets(self):
         # Create a canvas
@@ -115,6 +117,14 @@ class VideoTextExtractorApp:
 
         self.camera_selection.grid(row=0, column=2, pady=10, padx=10)
 
+        # Several indices (e.g. "0,1,2") scan all of those cameras at once,
+        # the path of a recorded session plays it back instead of a camera
+        self.cameras_frame = tk.Frame(self.frame)
+        self.cameras_frame.grid(row=1, column=0, pady=10, padx=10)
+        tk.Label(self.cameras_frame, text="Cameras:").pack(side="left")
+        self.cameras_entry = tk.Entry(self.cameras_frame, width=12)
+        self.cameras_entry.pack(side="left")
+
         self.start_button = tk.Button(self.frame, text="Start Scanning", command=self.start_scanning, bg='lightblue')
         self.start_button.grid(row=1, column=1, pady=10, padx=10)
 
@@ -133,12 +143,26 @@ class VideoTextExtractorApp:
         self.qr_list_label = tk.Label(self.frame, text="", wraplength=780, anchor="w", justify="left")
         self.qr_list_label.grid(row=5, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
 
+        self.text_page_frame = tk.Frame(self.frame)
+        self.text_page_frame.grid(row=4, column=2, pady=10, padx=10, sticky="n")
+        tk.Button(self.text_page_frame, text="Older", command=lambda: self.text_history.older()).pack(side="left")
+        tk.Button(self.text_page_frame, text="Newer", command=lambda: self.text_history.newer()).pack(side="left")
+
+        self.qr_page_frame = tk.Frame(self.frame)
+        self.qr_page_frame.grid(row=5, column=2, pady=10, padx=10, sticky="n")
+        tk.Button(self.qr_page_frame, text="Older", command=lambda: self.qr_history.older()).pack(side="left")
+        tk.Button(self.qr_page_frame, text="Newer", command=lambda: self.qr_history.newer()).pack(side="left")
+
         self.open_link_button = tk.Button(self.frame, text="Open QR Link", command=self.open_qr_link, state='disabled', bg='lightblue')
         self.open_link_button.grid(row=6, column=1, pady=10, padx=10)
 
-        self.generate_pdf_button = tk.Button(self.frame, text="Generate PDF", command=self.generate_pdf, bg='lightblue')
+        self.generate_pdf_button = tk.Button(self.frame, text="Generate Report", command=self.generate_pdf, bg='lightblue')
         self.generate_pdf_button.grid(row=6, column=2, pady=10, padx=10)
 
+        self.report_format_selection = ttk.Combobox(self.frame, values=[fmt.upper() for fmt in EXPORT_FORMATS], width=8, state="readonly")
+        self.report_format_selection.current(0)
+        self.report_format_selection.grid(row=7, column=2, pady=10, padx=10)
+
         self.weight_label = tk.Label(self.frame, text="Weight: 0.0 kg")
         self.weight_label.grid(row=9, column=0, pady=10, padx=10)
 
@@ -148,157 +172,320 @@ class VideoTextExtractorApp:
         self.qr_scan_count_label = tk.Label(self.frame, text="QR Codes Scanned: 0")
         self.qr_scan_count_label.grid(row=8, column=0, pady=10, padx=10)
 
+        self.gate_label = tk.Label(self.frame, text="Frames analyzed: 0, skipped: 0")
+        self.gate_label.grid(row=10, column=0, columnspan=2, pady=10, padx=10, sticky="w")
+
+    def start_metrics(self):
+        try:
+            self.core.start_metrics()
+        except OSError as e:
+            self.log(f"Failed to start metrics export: {e}")
+
     def update_scroll_region(self, event=None):
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def start_scanning(self):
-        self.camera_index = 0 if self.camera_selection.get() == "Front Camera" else 1
-        self.cap = cv2.VideoCapture(self.camera_index)
+        from multi_camera import parse_camera_list
+        source = self.cameras_entry.get().strip()
+        cameras = parse_camera_list(source)
+        if len(cameras) > 1:
+            self.start_multi_camera(cameras)
+            return
+        # The analyzers keep warming up in the background while the camera opens
+        self.core.warm_up()
+        if is_recording(source):
+            self.core.camera = os.path.basename(os.path.normpath(source))
+            self.cap = ReplaySource(source, speed=self.replay_speed)
+            station = f"replay {self.core.camera}"
+            recorder = None
+        else:
+            self.core.camera = cameras[0] if cameras else (0 if self.camera_selection.get() == "Front Camera" else 1)
+            self.cap = cv2.VideoCapture(self.core.camera)
+            station = f"camera {self.core.camera}"
+            recorder = self.core.start_recording(station) if self.cap.isOpened() else None
         if not self.cap.isOpened():
             messagebox.showerror("Error", "Failed to open the camera.")
             return
         
+        self.grabber = FrameGrabber(self.cap, metrics=self.metrics, recorder=recorder).start()
+        self.begin_session(station)
         self.open_serial_connection()
         self.scan_frame()
 
+    def begin_session(self, station):
+        # The report covers one session, so every session starts with nothing
+        # seen and the counters and history match what the report will hold
+        self.core.new_session(station=station)
+        self.core.qr_scanner.reset()
+        self.core.text_index.clear()
+        self.text_history.clear()
+        self.qr_history.clear()
+        self.last_text_regions = []
+        self.qr_url = ""
+        self.open_link_button.config(state='disabled')
+        self.core.frame_count = 0
+        self.text_scan_count = 0
+        self.qr_scan_count = 0
+        self.color_detector.detected_colors.clear()
+        self.ui.set_text(self.text_scan_count_label, "Texts Scanned: 0")
+        self.ui.set_text(self.qr_scan_count_label, "QR Codes Scanned: 0")
+
+    def start_multi_camera(self, cameras):
+        if self.multi_scanner is not None or self.grabber is not None:
+            return
+        from multi_camera import MultiCameraScanner
+        # Every camera gets its own process with capture, gate and analyzers;
+        # this process only merges the results
+        self.core.wait_ready(timeout=5.0)  # The cross-camera dedupe needs the QR scanner
+        pipeline_options = {"change_threshold": self.core.change_threshold, "qr_full_search_every": 5}
+        self.multi_scanner = MultiCameraScanner(cameras, pipeline_options,
+                                                tesseract_cmd=self.core.tesseract_cmd).start()
+        self.begin_session("cameras " + ",".join(str(camera) for camera in cameras))
+        # The preview shows the first camera, read straight from shared memory
+        self.preview_camera = cameras[0]
+        self.preview_seq = 0
+        self.open_serial_connection()
+        self.log(f"Scanning cameras {', '.join(str(camera) for camera in cameras)}")
+        self.poll_cameras()
+
+    def poll_cameras(self):
+        if self.multi_scanner is None:
+            return
+        self.core.report_messages()
+        for kind, camera, payload in self.multi_scanner.poll():
+            if kind == "error":
+                self.log(f"Camera {camera}: {payload}")
+            else:
+                self.handle_camera_result(camera, payload)
+
+        latest = self.multi_scanner.acquire_frame(self.preview_camera, self.preview_seq)
+        if latest is not None:
+            slot, self.preview_seq, _, frame = latest
+            try:
+                self.display_frame(frame)
+            finally:
+                del frame
+                self.multi_scanner.release_frame(self.preview_camera, slot)
+
+        now = time.time()
+        if now - self.last_stats_update >= 1.0:
+            self.last_stats_update = now
+            self.update_weight()
+            self.ui.set_text(self.gate_label, self.multi_scanner.summary())
+            self.metrics.set_gauge("camera_fps_total", self.multi_scanner.total_fps())
+
+        if not self.multi_scanner.running():
+            self.stop_scanning()
+            return
+        self.root.after(50, self.poll_cameras)
+
+    def handle_camera_result(self, camera, result):
+        frame_id = result["frame"]
+        timestamp = result["timestamp"]
+        self.core.frame_count += 1
+        for qr in result.get("qr", []):
+            # Each camera only knows its own codes, dedupe across all of them here
+            if qr["new"] and self.core.qr_scanner.seen.add(qr["text"], timestamp):
+                self.handle_qr(qr["text"], camera=camera, frame_id=frame_id)
+        texts = [region["text"] for region in result.get("text", []) if region["text"]]
+        if texts:
+            self.handle_text("\n".join(texts), camera=camera, frame_id=frame_id)
+        detected_color = result.get("color")
+        if detected_color is not None and timestamp - self.camera_color_times.get(camera, float("-inf")) >= 0.2:
+            self.camera_color_times[camera] = timestamp
+            self.color_detector.detected_colors[detected_color] = self.color_detector.detected_colors.get(detected_color, 0) + 1
+            self.core.record_event("color", detected_color, timestamp=timestamp, camera=camera, frame_id=frame_id)
+
+    def stop_multi_camera(self):
+        for kind, camera, payload in self.multi_scanner.stop():
+            if kind == "error":
+                self.log(f"Camera {camera}: {payload}")
+            else:
+                self.handle_camera_result(camera, payload)
+        for camera, stats in self.multi_scanner.camera_stats.items():
+            if stats:
+                self.log(f"Camera {camera}: captured {stats['captured']}, analyzed {stats['analyzed']}, "
+                         f"dropped {stats['dropped']}, {stats['analyze_fps']:.1f} frames/s")
+        self.multi_scanner = None
+        self.camera_color_times = {}
+        self.preview.clear()
+        self.close_serial_connection()
+        self.log("Stopped scanning.")
+
     def stop_scanning(self):
-        if self.cap is not None and self.cap.isOpened():
-            self.cap.release()
-            self.video_label.config(image='')
+        if self.multi_scanner is not None:
+            self.stop_multi_camera()
+            return
+        if self.grabber is not None:
+            self.grabber.stop()
+            stats = self.grabber.stats()
+            self.log(f"Frames captured: {stats['captured']}, dropped: {stats['dropped']}, stale reads: {stats['stale']}")
+            self.grabber = None
+            self.log_analyzer_report()
+            recorded = self.core.stop_recording()
+            if recorded is not None:
+                path, stats = recorded
+                self.log(f"Recorded {stats['frames']} frames and {stats['weights']} weight readings to {path}"
+                         + (f", {stats['dropped']} dropped" if stats['dropped'] else ""))
+        if self.cap is not None:
+            # Released by the grabber's thread once its last read returns
+            self.preview.clear()
             self.cap = None
             self.close_serial_connection()
-            self.text_output.insert(tk.END, "Stopped scanning.\n")
+            self.log("Stopped scanning.")
 
     def scan_frame(self):
-        if self.cap is None or not self.cap.isOpened():
+        if self.grabber is None:
             return
 
-        ret, frame = self.cap.read()
-        if not ret:
+        self.core.dispatch_ocr()
+
+        if self.grabber.failed:
+            replay = isinstance(self.cap, ReplaySource)
             self.stop_scanning()
-            messagebox.showerror("Error", "Failed to capture video frame.")
+            if replay:
+                self.log("Replay finished.")
+            else:
+                messagebox.showerror("Error", "Failed to capture video frame.")
             return
 
-        self.detect_qr_codes(frame)
-        self.extract_text(frame)
-        self.color_detector.detect_color(frame)  # Call the detect_color method from ColorDetector
+        latest = self.grabber.read_latest()
+        if latest is None:
+            # No new frame yet, check again shortly
+            self.root.after(5, self.scan_frame)
+            return
+        _, timestamp, frame = latest
+
+        # The scheduler decides which analyzers are due on this frame
+        self.scheduler.run(frame, timestamp)
 
         # Display video frame
-        self.display_frame(frame)
+        with self.metrics.time("display"):
+            self.display_frame(frame)
 
-        self.frame_count += 1
+        self.core.frame_count += 1
+        self.metrics.tick_frame()
 
-        if self.frame_count % 30 == 0:
-            self.update_weight()
+        self.root.after(1, self.scan_frame)
+
+    def detect_color(self, frame):
+        detected_color = self.color_detector.detect_color(frame)
+        if detected_color is not None:
+            self.core.record_event("color", detected_color)
+        return detected_color
+
+    def update_status(self):
+        self.ui.set_text(self.gate_label, self.core.status())
+        if self.grabber is not None:
+            self.metrics.set_gauge("dropped_frames", self.grabber.dropped_count)
+        self.metrics.set_gauge("analyze_skip_rate", self.core.change_gate.skip_rate())
 
-        self.root.after(10, self.scan_frame)
+    def log_analyzer_report(self):
+        for line in self.core.report_lines():
+            self.log(line)
 
     def extract_text(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        text = pytesseract.image_to_string(gray)
-        if text.strip():
-            if text != self.alreadyText:
-                self.text_output.insert(tk.END, f"Extracted text: {text}\n")
-                self.extracted_texts.append(text)
-                self.text_list_label.config(text="\n".join(self.extracted_texts))
-                self.text_scan_count += 1
-                self.text_scan_count_label.config(text=f"Texts Scanned: {self.text_scan_count}")
-                self.alreadyText = text
+        # Sends only the candidate text boxes to Tesseract, skipped while the workers are busy
+        self.core.submit_ocr(frame, self.handle_text_regions)
+
+    def handle_text_regions(self, regions):
+        # regions is [(box, text), ...] in reading order
+        self.last_text_regions = [box for box, _ in regions]
+        self.handle_text("\n".join(region_text.strip() for _, region_text in regions))
+
+    def handle_text(self, text, camera=None, frame_id=None):
+        if self.core.add_text(text, camera=camera, frame_id=frame_id):
+            self.log(f"Extracted text: {text}")
+            self.text_history.add(text)
+            self.text_scan_count += 1
+            self.ui.set_text(self.text_scan_count_label, f"Texts Scanned: {self.text_scan_count}")
 
     def detect_qr_codes(self, frame):
-        decoded_objects = pyzbar.decode(frame)
-        for obj in decoded_objects:
-            qr_text = obj.data.decode('utf-8')
-            if qr_text not in self.extracted_qrs:
-                self.text_output.insert(tk.END, f"QR Code detected: {qr_text}\n")
-                self.extracted_qrs.append(qr_text)
-                self.qr_list_label.config(text="\n".join(self.extracted_qrs))
-                self.qr_scan_count += 1
-                self.qr_scan_count_label.config(text=f"QR Codes Scanned: {self.qr_scan_count}")
-                if qr_text.startswith("http://") or qr_text.startswith("https://"):
-                    self.qr_url = qr_text
-                    self.open_link_button.config(state='normal')
+        # Only codes never seen before this session come back, already recorded
+        for qr_text in self.core.scan_qr(frame):
+            self.show_qr(qr_text)
+
+    def handle_qr(self, qr_text, camera=None, frame_id=None):
+        self.core.record_event("qr", qr_text, camera=camera, frame_id=frame_id)
+        self.show_qr(qr_text)
+
+    def show_qr(self, qr_text):
+        self.log(f"QR Code detected: {qr_text}")
+        self.qr_history.add(qr_text)
+        self.qr_scan_count += 1
+        self.ui.set_text(self.qr_scan_count_label, f"QR Codes Scanned: {self.qr_scan_count}")
+        if qr_text.startswith("http://") or qr_text.startswith("https://"):
+            self.qr_url = qr_text
+            self.open_link_button.config(state='normal')
 
     def open_qr_link(self):
         if self.qr_url:
+            import webbrowser
             webbrowser.open(self.qr_url)
 
     def display_frame(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = cv2.resize(frame, (400, 150))
-        img = Image.fromarray(frame)
-        imgtk = ImageTk.PhotoImage(image=img)
-        self.video_label.imgtk = imgtk
-        self.video_label.config(image=imgtk)
+        self.preview.render(frame)
+
+    def preview_overlay(self):
+        return self.metrics.summary() if self.show_metrics_overlay else None
+
+    def preview_boxes(self):
+        return self.last_text_regions
 
     def open_serial_connection(self):
-        try:
-            self.serial_connection = serial.Serial(self.weight_port, 9600, timeout=1)
-        except serial.SerialException as e:
-            self.text_output.insert(tk.END, f"Failed to connect to weight sensor: {e}\n")
-            self.serial_connection = None
+        self.weight_error = None
+        self.core.open_weight(self.cap)
 
     def close_serial_connection(self):
-        if self.serial_connection is not None:
-            self.serial_connection.close()
-            self.serial_connection = None
+        self.core.close_weight()
 
     def update_weight(self):
-        if self.serial_connection is not None:
-            self.serial_connection.write(b'W')
-            weight_data = self.serial_connection.readline().decode('utf-8').strip()
-            try:
-                self.weight = float(weight_data)
-                self.weight_label.config(text=f"Weight: {self.weight:.2f} kg")
-            except ValueError:
-                self.text_output.insert(tk.END, "Failed to read weight data.\n")
+        # Only reads the cached value, never waits for the scale
+        if self.core.weight_reader is None:
+            return
+        weight = self.core.poll_weight(max_age=5.0)
+        if weight is not None:
+            self.ui.set_text(self.weight_label, f"Weight: {weight:.2f} kg")
+        error = self.core.weight_reader.last_error
+        if error is not None and error != self.weight_error:
+            self.log(f"Weight sensor: {error}")
+        self.weight_error = error
+
+    def log(self, message):
+        self.ui.post_log(message)
 
     def generate_pdf(self):
+        # The report is written from the session store on a background thread
+        fmt = self.report_format_selection.get().lower()
+        report_output = f"scanned_data.{fmt}"
         try:
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            
-            pdf.cell(200, 10, txt="Scanned Texts", ln=True, align='C')
-            for text in self.extracted_texts:
-                pdf.multi_cell(0, 10, txt=text)
-            
-            pdf.add_page()
-            pdf.cell(200, 10, txt="Scanned QR Codes", ln=True, align='C')
-            for qr in self.extracted_qrs:
-                pdf.multi_cell(0, 10, txt=qr)
-            
-            pdf.add_page()
-            pdf.cell(200, 10, txt="Detected Colors", ln=True, align='C')
-            for color, count in self.color_detector.detected_colors.items():
-                pdf.multi_cell(0, 10, txt=f"{color}: {count}")
-            
-            pdf.add_page()
-            pdf.cell(200, 10, txt="Weight Measurements", ln=True, align='C')
-            pdf.cell(0, 10, txt=f"Weight: {self.weight:.2f} kg")
- 
-            pdf_output = "scanned_data.pdf"
-            pdf.output(pdf_output)
-            self.text_output.insert(tk.END, f"PDF generated: {pdf_output}\n")
-            print("PDF generated")  # Debug statement
-
-            # Add a short delay before checking if the file exists
-            time.sleep(0.5)
-
-            # Verify the file was created
-            if os.path.exists(pdf_output):
-                self.text_output.insert(tk.END, f"PDF successfully saved as {pdf_output}\n")
-                print("PDF successfully saved")  # Debug statement
-            else:
-                self.text_output.insert(tk.END, "Error: PDF file not found after saving.\n")
-                print("PDF file not found")  # Debug statement
-                
+            future = self.core.report_exporter.export(report_output, fmt)
         except Exception as e:
-            self.text_output.insert(tk.END, f"Error generating PDF: {str(e)}\n")
-            print(f"Error generating PDF: {str(e)}")  # Debug statement
+            self.log(f"Error generating report: {str(e)}")
+            return
+        self.generate_pdf_button.config(state='disabled')
+        self.log(f"Generating {fmt.upper()} report...")
+        self.root.after(200, self.check_report, future)
+
+    def check_report(self, future):
+        if not future.done():
+            self.root.after(200, self.check_report, future)
+            return
+        self.generate_pdf_button.config(state='normal')
+        error = future.exception()
+        if error is not None:
+            self.log(f"Error generating report: {str(error)}")
+            return
+        report_output, event_count = future.result()
+        if os.path.exists(report_output):
+            self.log(f"Report successfully saved as {report_output} ({event_count} events)")
+        else:
+            self.log("Error: report file not found after saving.")
 
     def on_closing(self):
         self.stop_scanning()
+        self.ui.stop()
+        self.core.shutdown()
         self.root.destroy()
 
 if __name__ == "__main__":
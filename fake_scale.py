@@ -0,0 +1,101 @@
+import argparse
+import os
+import pty
+import select
+import threading
+import time
+import tty
+
+
+class FakeScale:
+    # Simulated serial scale on a Linux pseudo-terminal. Open self.port with
+    # pyserial like a real device. In poll mode every received command byte is
+    # answered with one reading; in stream mode readings are sent every
+    # interval seconds without being asked.
+    def __init__(self, weight=1.25, mode="poll", commands=b'WR', interval=0.1, line_format="{weight:.2f}\r\n"):
+        self.weight = weight
+        self.mode = mode
+        self.commands = commands
+        self.interval = interval
+        self.line_format = line_format
+        self.silent = False        # Stop answering, like an unplugged scale
+        self.garbage = None        # Bytes to send instead of the next reading
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.requests = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="FakeScale", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def set_weight(self, weight):
+        self.weight = weight
+
+    def _send_reading(self):
+        if self.silent:
+            return
+        if self.garbage is not None:
+            data, self.garbage = self.garbage, None
+        else:
+            data = self.line_format.format(weight=self.weight).encode('ascii')
+        os.write(self.master, data)
+
+    def _run(self):
+        next_send = time.time()
+        while self.running:
+            timeout = max(0.0, next_send - time.time()) if self.mode == "stream" else 0.05
+            try:
+                readable, _, _ = select.select([self.master], [], [], timeout)
+            except (OSError, ValueError):
+                break
+            if readable:
+                try:
+                    data = os.read(self.master, 64)
+                except OSError:
+                    break
+                if self.mode == "poll":
+                    for byte in data:
+                        if byte in self.commands:
+                            self.requests += 1
+                            self._send_reading()
+            if self.mode == "stream" and time.time() >= next_send:
+                self._send_reading()
+                next_send = time.time() + self.interval
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a simulated serial scale on a pseudo-terminal.")
+    parser.add_argument("--weight", type=float, default=1.25)
+    parser.add_argument("--stream", action="store_true", help="send readings continuously instead of on request")
+    parser.add_argument("--interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    scale = FakeScale(weight=args.weight, mode="stream" if args.stream else "poll", interval=args.interval).start()
+    print(f"Fake scale listening on {scale.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scale.stop()
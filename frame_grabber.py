@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import deque
+
+
+class FrameGrabber:
+    # Reads frames from a cv2.VideoCapture on its own thread so capture speed
+    # no longer depends on how long the analyzers take on the Tk thread.
+    # With a recorder, every captured frame is also written to the session
+    # recording, including the frames the analyzers skip. The grabber owns the
+    # capture: its thread releases it when the loop ends, so the capture is
+    # never released while a read is still running on it.
+    def __init__(self, cap, buffer_size=2, metrics=None, recorder=None):
+        self.cap = cap
+        self.metrics = metrics
+        self.recorder = recorder
+        self.buffer = deque(maxlen=buffer_size)  # Only the newest frames are kept
+        self.lock = threading.Lock()
+        self.new_frame = threading.Event()
+        self.thread = None
+        self.running = False
+        self.failed = False
+        self.seq = 0              # Sequence number of the last captured frame
+        self.last_read_seq = 0    # Sequence number of the last frame handed out
+        self.captured_count = 0
+        self.dropped_count = 0    # Frames replaced by a newer one before being read
+        self.stale_count = 0      # Reads that found no frame newer than the last one
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.failed = False
+        self.thread = threading.Thread(target=self._capture_loop, name="FrameGrabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        # A read that outlives the join still finishes before the capture
+        # thread releases the capture
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        else:
+            self.cap.release()
+
+    def _capture_loop(self):
+        try:
+            while self.running:
+                start = time.perf_counter()
+                ret, frame = self.cap.read()
+                if self.metrics is not None:
+                    self.metrics.observe("capture", time.perf_counter() - start)
+                if not ret:
+                    self.failed = True
+                    self.running = False
+                    self.new_frame.set()
+                    break
+                timestamp = time.time()
+                with self.lock:
+                    self.seq += 1
+                    self.captured_count += 1
+                    seq = self.seq
+                    self.buffer.append((seq, timestamp, frame))
+                self.new_frame.set()
+                if self.recorder is not None:
+                    self.recorder.write_frame(frame, timestamp, seq)
+        finally:
+            self.cap.release()
+
+    def read_latest(self, timeout=None):
+        # Returns (seq, timestamp, frame) for the freshest frame, or None when
+        # nothing newer than the previous read has arrived yet.
+        if timeout is not None:
+            self.new_frame.wait(timeout)
+        with self.lock:
+            self.new_frame.clear()
+            if not self.buffer or self.buffer[-1][0] <= self.last_read_seq:
+                self.stale_count += 1
+                return None
+            seq, timestamp, frame = self.buffer[-1]
+            # Every frame captured between two reads was skipped for a newer one
+            self.dropped_count += seq - self.last_read_seq - 1
+            self.last_read_seq = seq
+            return seq, timestamp, frame
+
+    def stats(self):
+        with self.lock:
+            return {
+                "captured": self.captured_count,
+                "dropped": self.dropped_count,
+                "stale": self.stale_count,
+                "latest_seq": self.seq,
+            }
@@ -0,0 +1,163 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SLOT_FIELDS = 5          # seq, refs, height, width, channels
+SEQ, REFS, HEIGHT, WIDTH, CHANNELS = range(SLOT_FIELDS)
+DATA_ALIGNMENT = 64
+
+
+def _attach(name):
+    # Only the creating process unlinks the block. Before Python 3.13 the
+    # attach is registered with the resource tracker the child shares with
+    # its parent, which is harmless; track=False avoids it where available.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    # Fixed number of frame-sized slots in one shared memory block, so frames
+    # can be handed between processes without pickling them. A single writer
+    # copies each frame into a free slot once and publishes it with a new
+    # sequence number; readers get numpy views into the slot and hold a
+    # reference until they release it. Slots with references are never
+    # overwritten, when all slots are busy the new frame is dropped.
+    #
+    # Pass the ring to a multiprocessing.Process as an argument to share it;
+    # the child attaches to the same block. The lock must come from the same
+    # multiprocessing context as the processes, hence the context argument.
+    def __init__(self, slots=4, slot_bytes=1920 * 1080 * 3, context=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.lock = (context or multiprocessing).Lock()
+        self.owner = True
+        self.header_bytes = 8 + slots * SLOT_FIELDS * 8 + slots * 8
+        self.data_offset = -(-self.header_bytes // DATA_ALIGNMENT) * DATA_ALIGNMENT
+        self.shm = shared_memory.SharedMemory(create=True, size=self.data_offset + slots * slot_bytes)
+        self._map()
+        self.counter[0] = 0
+        self.fields[:] = 0
+        self.timestamps[:] = 0.0
+        self.written_count = 0
+        self.dropped_count = 0     # No free slot, every slot still referenced
+        self.too_large_count = 0   # Frame does not fit into a slot
+
+    def _map(self):
+        buf = self.shm.buf
+        self.counter = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self.fields = np.ndarray((self.slots, SLOT_FIELDS), dtype=np.int64, buffer=buf, offset=8)
+        self.timestamps = np.ndarray((self.slots,), dtype=np.float64, buffer=buf,
+                                     offset=8 + self.slots * SLOT_FIELDS * 8)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __getstate__(self):
+        return {"name": self.shm.name, "slots": self.slots, "slot_bytes": self.slot_bytes, "lock": self.lock}
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.slot_bytes = state["slot_bytes"]
+        self.lock = state["lock"]
+        self.owner = False
+        self.header_bytes = 8 + self.slots * SLOT_FIELDS * 8 + self.slots * 8
+        self.data_offset = -(-self.header_bytes // DATA_ALIGNMENT) * DATA_ALIGNMENT
+        self.shm = _attach(state["name"])
+        self._map()
+        self.written_count = 0
+        self.dropped_count = 0
+        self.too_large_count = 0
+
+    def _view(self, slot):
+        height, width, channels = self.fields[slot, HEIGHT:CHANNELS + 1]
+        shape = (height, width) if channels == 0 else (height, width, channels)
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf,
+                          offset=self.data_offset + slot * self.slot_bytes)
+
+    def write(self, frame, timestamp=None, refs=0):
+        # Copies a uint8 frame into a free slot and returns (slot, seq), or
+        # None when it was dropped. refs > 0 publishes the slot already
+        # referenced for that many readers, who then only call view()/release().
+        if frame.dtype != np.uint8 or frame.ndim not in (2, 3):
+            raise ValueError("FrameRing only holds 2D or 3D uint8 frames")
+        if frame.nbytes > self.slot_bytes:
+            self.too_large_count += 1
+            return None
+        with self.lock:
+            free = [slot for slot in range(self.slots) if self.fields[slot, REFS] == 0]
+            if not free:
+                self.dropped_count += 1
+                return None
+            # Reuse the slot holding the oldest frame
+            slot = min(free, key=lambda index: self.fields[index, SEQ])
+            self.fields[slot, SEQ] = 0  # Unpublished while it is being written
+            self.fields[slot, HEIGHT] = frame.shape[0]
+            self.fields[slot, WIDTH] = frame.shape[1]
+            self.fields[slot, CHANNELS] = frame.shape[2] if frame.ndim == 3 else 0
+        np.copyto(self._view(slot), frame)
+        with self.lock:
+            self.counter[0] += 1
+            seq = int(self.counter[0])
+            self.fields[slot, SEQ] = seq
+            self.fields[slot, REFS] = refs
+            self.timestamps[slot] = time.time() if timestamp is None else timestamp
+        self.written_count += 1
+        return slot, seq
+
+    def acquire(self, slot, seq):
+        # View of the frame published as seq, or None when the slot has
+        # been reused since. Call release(slot) when done with the view.
+        with self.lock:
+            if self.fields[slot, SEQ] != seq:
+                return None
+            self.fields[slot, REFS] += 1
+        return self._view(slot)
+
+    def acquire_latest(self, after_seq=0):
+        # (slot, seq, timestamp, view) of the newest frame newer than after_seq, or None
+        with self.lock:
+            slot = int(np.argmax(self.fields[:, SEQ]))
+            seq = int(self.fields[slot, SEQ])
+            if seq <= after_seq:
+                return None
+            self.fields[slot, REFS] += 1
+            timestamp = float(self.timestamps[slot])
+        return slot, seq, timestamp, self._view(slot)
+
+    def view(self, slot, seq=None):
+        # View of a slot the caller already holds a reference to
+        if seq is not None and self.fields[slot, SEQ] != seq:
+            return None
+        return self._view(slot)
+
+    def release(self, slot):
+        with self.lock:
+            if self.fields[slot, REFS] > 0:
+                self.fields[slot, REFS] -= 1
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "latest_seq": int(self.counter[0]),
+            "referenced": int(np.count_nonzero(self.fields[:, REFS])),
+            "written": self.written_count,
+            "dropped": self.dropped_count,
+            "too_large": self.too_large_count,
+        }
+
+    def close(self):
+        # Views handed out must be gone before the block can be unmapped
+        self.counter = self.fields = self.timestamps = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,181 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency bucket upper bounds in seconds, Prometheus style
+DEFAULT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Estimate from the buckets: upper bound of the bucket holding the quantile
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    # Per-stage latency histograms, counters and gauges for the scan pipeline.
+    # Every update is a lock plus a few additions, cheap enough to leave on.
+    def __init__(self, prefix="scanner"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.fps = 0.0
+        self.last_frame_time = None
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def tick_frame(self):
+        # Call once per processed frame; keeps a smoothed frames-per-second gauge
+        now = time.perf_counter()
+        with self.lock:
+            if self.last_frame_time is not None:
+                interval = now - self.last_frame_time
+                if interval > 0:
+                    self.fps = 0.9 * self.fps + 0.1 * (1.0 / interval) if self.fps else 1.0 / interval
+            self.last_frame_time = now
+            self.counters["frames"] = self.counters.get("frames", 0) + 1
+            self.gauges["fps"] = self.fps
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            name = f"{self.prefix}_stage_latency_seconds"
+            if self.histograms:
+                lines.append(f"# HELP {name} Latency of each pipeline stage.")
+                lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                running = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    running += bucket_count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {running}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+                lines.append(f"{self.prefix}_{counter}_total {value}")
+            for gauge, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+                lines.append(f"{self.prefix}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, stages=None):
+        # One-line summary for an on-screen overlay
+        with self.lock:
+            parts = [f"FPS {self.fps:.1f}"]
+            for stage in stages if stages is not None else sorted(self.histograms):
+                histogram = self.histograms.get(stage)
+                if histogram is not None and histogram.count:
+                    parts.append(f"{stage} p50<{histogram.quantile(0.5) * 1000:.0f}ms")
+            if "dropped_frames" in self.gauges:
+                parts.append(f"dropped {self.gauges['dropped_frames']}")
+            if "ocr_backlog" in self.gauges:
+                parts.append(f"ocr backlog {self.gauges['ocr_backlog']}")
+        return " | ".join(parts)
+
+
+class MetricsServer:
+    # Serves Metrics.render_prometheus() on http://host:port/metrics
+    def __init__(self, metrics, port=9108, host="127.0.0.1"):
+        metrics_ref = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics_ref.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsFileDumper:
+    # Periodically writes the Prometheus text to a file (e.g. for node_exporter's textfile collector)
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="MetricsFileDumper", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
+        self.dump()
+
+    def dump(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as output:
+            output.write(self.metrics.render_prometheus())
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
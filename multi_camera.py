@@ -0,0 +1,227 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+
+import cv2
+
+from frame_grabber import FrameGrabber
+from frame_ring import FrameRing
+from ocr_engine import configure_tesseract
+from pipeline import FramePipeline
+
+
+def parse_camera_list(text):
+    # "0, 1,2" -> [0, 1, 2]; anything that is not an index is ignored
+    return [int(part) for part in text.replace(";", ",").split(",") if part.strip().isdigit()]
+
+
+def _put(results, message):
+    # Never block a camera on a full queue, the GUI may be busy; the
+    # message is dropped instead
+    try:
+        results.put_nowait(message)
+        return True
+    except queue.Full:
+        return False
+
+
+def _camera_worker(camera, pipeline_options, results, stop_event, tesseract_cmd, stats_interval, ring):
+    # Runs in its own process: captures on a thread and analyzes the newest
+    # frame in the process main loop, so every camera gets its own core.
+    # Each analyzed frame is also published in the shared memory ring, where
+    # the GUI picks up its preview without the frame being pickled.
+    configure_tesseract(tesseract_cmd)
+    cap = cv2.VideoCapture(camera)
+    if not cap.isOpened():
+        _put(results, ("error", camera, f"Failed to open camera {camera}"))
+        _put(results, ("done", camera, None))
+        ring.close()
+        return
+
+    grabber = FrameGrabber(cap).start()
+    pipeline = FramePipeline(**pipeline_options)
+    started = time.time()
+    last_stats = started
+    counts = {"analyzed": 0, "gated": 0, "results": 0, "lost_results": 0}
+
+    def stats():
+        elapsed = max(time.time() - started, 1e-6)
+        values = dict(grabber.stats(), **counts)
+        values["ring_too_large"] = ring.too_large_count
+        values["elapsed"] = elapsed
+        values["capture_fps"] = values["captured"] / elapsed
+        values["analyze_fps"] = (counts["analyzed"] + counts["gated"]) / elapsed
+        return values
+
+    try:
+        while not stop_event.is_set():
+            if grabber.failed:
+                _put(results, ("error", camera, f"Failed to capture from camera {camera}"))
+                break
+            latest = grabber.read_latest(timeout=0.5)
+            if latest is not None:
+                seq, timestamp, frame = latest
+                ring.write(frame, timestamp)
+                try:
+                    result = pipeline.analyze(frame, frame_id=seq, timestamp=timestamp)
+                except Exception as e:
+                    # E.g. no OCR engine in this process; every frame would fail the same way
+                    _put(results, ("error", camera, f"Analysis failed on camera {camera}: {e}"))
+                    break
+                if result is None:
+                    counts["gated"] += 1
+                else:
+                    counts["analyzed"] += 1
+                    result["camera"] = camera
+                    if _put(results, ("result", camera, result)):
+                        counts["results"] += 1
+                    else:
+                        counts["lost_results"] += 1
+            if time.time() - last_stats >= stats_interval:
+                _put(results, ("stats", camera, stats()))
+                last_stats = time.time()
+    finally:
+        grabber.stop()  # Also releases the capture
+        _put(results, ("done", camera, stats()))
+        ring.close()
+
+
+class MultiCameraScanner:
+    # Scans several cameras at once, one process per camera, each with its own
+    # capture thread and FramePipeline. poll() merges the results of all
+    # cameras without blocking and returns them as (kind, camera, payload)
+    # with kind "result" (a pipeline dict tagged with "camera") or "error".
+    # Throughput per camera is kept in self.camera_stats. The newest frame of
+    # every camera is readable through acquire_frame() from shared memory.
+    def __init__(self, cameras, pipeline_options=None, tesseract_cmd=None, stats_interval=1.0, max_queue=256,
+                 ring_slots=3, ring_slot_bytes=1920 * 1080 * 3):
+        self.cameras = list(cameras)
+        self.pipeline_options = dict(pipeline_options or {})
+        self.tesseract_cmd = tesseract_cmd
+        self.stats_interval = stats_interval
+        # Spawn, not fork: forking a process that runs Tk and capture threads is unsafe
+        self.context = multiprocessing.get_context("spawn")
+        self.results = self.context.Queue(maxsize=max_queue)
+        self.stop_event = self.context.Event()
+        self.processes = {}
+        self.camera_stats = {camera: {} for camera in self.cameras}
+        self.finished = set()
+        self.rings = {camera: FrameRing(ring_slots, ring_slot_bytes, context=self.context) for camera in self.cameras}
+
+    def start(self):
+        for camera in self.cameras:
+            process = self.context.Process(
+                target=_camera_worker,
+                args=(camera, self.pipeline_options, self.results, self.stop_event,
+                      self.tesseract_cmd, self.stats_interval, self.rings[camera]),
+                name=f"Camera{camera}", daemon=True)
+            process.start()
+            self.processes[camera] = process
+        return self
+
+    def running(self):
+        # A worker whose "done" message was dropped counts as finished once it exited
+        return any(camera not in self.finished and process.is_alive()
+                   for camera, process in self.processes.items())
+
+    def poll(self, max_items=200):
+        items = []
+        for _ in range(max_items):
+            try:
+                kind, camera, payload = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "stats":
+                self.camera_stats[camera] = payload
+            elif kind == "done":
+                self.finished.add(camera)
+                if payload is not None:
+                    self.camera_stats[camera] = payload
+            else:
+                items.append((kind, camera, payload))
+        return items
+
+    def stop(self, timeout=3.0):
+        # Keeps draining while the workers shut down, a process cannot exit
+        # while its last messages are still stuck in the queue
+        self.stop_event.set()
+        deadline = time.time() + timeout
+        items = []
+        while self.running() and time.time() < deadline:
+            items.extend(self.poll())
+            time.sleep(0.02)
+        for process in self.processes.values():
+            process.join(timeout=max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+        items.extend(self.poll())  # What the workers sent just before they exited
+        for ring in self.rings.values():
+            ring.close()
+            ring.unlink()
+        self.rings = {}
+        return items
+
+    def acquire_frame(self, camera, after_seq=0):
+        # (slot, seq, timestamp, frame view) of the newest frame of a camera
+        # newer than after_seq, or None. Pass the slot to release_frame() and
+        # drop the view afterwards.
+        ring = self.rings.get(camera)
+        return ring.acquire_latest(after_seq) if ring is not None else None
+
+    def release_frame(self, camera, slot):
+        ring = self.rings.get(camera)
+        if ring is not None:
+            ring.release(slot)
+
+    def total_fps(self):
+        return sum(stats.get("analyze_fps", 0.0) for stats in self.camera_stats.values())
+
+    def summary(self):
+        parts = []
+        for camera in self.cameras:
+            stats = self.camera_stats.get(camera)
+            if not stats:
+                parts.append(f"cam {camera}: starting")
+                continue
+            parts.append(f"cam {camera}: {stats['analyze_fps']:.1f} fps, "
+                         f"{stats['dropped']} dropped, {stats['gated']} gated")
+        return " | ".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan several cameras at once and print the results as JSONL.")
+    parser.add_argument("cameras", help="comma separated camera indices, e.g. 0,1,2")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--change-threshold", type=float, default=6.0)
+    parser.add_argument("--no-ocr", action="store_true", help="skip text extraction")
+    parser.add_argument("--tesseract-cmd", default=None, help="path to the tesseract executable")
+    args = parser.parse_args()
+
+    scanner = MultiCameraScanner(
+        parse_camera_list(args.cameras),
+        pipeline_options={"ocr": not args.no_ocr, "change_threshold": args.change_threshold,
+                          "qr_full_search_every": 5},
+        tesseract_cmd=args.tesseract_cmd).start()
+    start_time = time.time()
+    try:
+        while scanner.running() and (args.duration is None or time.time() - start_time < args.duration):
+            for kind, camera, payload in scanner.poll():
+                if kind == "result":
+                    print(json.dumps(payload), flush=True)
+                else:
+                    print(f"Camera {camera}: {payload}", file=sys.stderr)
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    for kind, camera, payload in scanner.stop():
+        if kind == "result":
+            print(json.dumps(payload), flush=True)
+        else:
+            print(f"Camera {camera}: {payload}", file=sys.stderr)
+    for camera, stats in scanner.camera_stats.items():
+        if stats:
+            print(f"Camera {camera}: {stats['captured']} captured, {stats['analyzed']} analyzed, "
+                  f"{stats['analyze_fps']:.1f} frames/s", file=sys.stderr)
@@ -0,0 +1,182 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytesseract
+
+# Set OCR_ENGINE to "tesserocr", "capi" or "pytesseract" to force a backend
+ENGINE_ORDER = ("tesserocr", "capi", "pytesseract")
+WINDOWS_TESSERACT_PATHS = (
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+)
+
+
+def find_tesseract():
+    # TESSERACT_CMD, then the PATH, then the default Windows install locations
+    candidates = [os.environ.get("TESSERACT_CMD"), shutil.which("tesseract")]
+    candidates.extend(WINDOWS_TESSERACT_PATHS if os.name == "nt" else ())
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def configure_tesseract(tesseract_cmd=None):
+    # Points pytesseract at the given or discovered binary; returns the path used
+    tesseract_cmd = tesseract_cmd or find_tesseract()
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    return tesseract_cmd
+
+
+def _gray_buffer(image):
+    # Tesseract reads 8-bit grayscale rows straight from this buffer
+    if image.ndim != 2 or image.dtype != np.uint8:
+        raise ValueError("OCR engines expect a 2D uint8 grayscale image")
+    return np.ascontiguousarray(image)
+
+
+class PytesseractEngine:
+    # Fallback: starts the tesseract executable for every call, which writes
+    # the image to a temporary file and reloads the language model each time
+    name = "pytesseract"
+
+    def __init__(self, lang="eng"):
+        self.lang = lang
+        pytesseract.get_tesseract_version()  # Fails early when the binary is missing
+
+    def recognize(self, image, psm=6):
+        return pytesseract.image_to_string(image, lang=self.lang, config=f"--psm {psm}")
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    # Persistent libtesseract handle through the tesserocr package
+    name = "tesserocr"
+
+    def __init__(self, lang="eng"):
+        import tesserocr
+
+        self.tesserocr = tesserocr
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+        self.psm = None
+
+    def recognize(self, image, psm=6):
+        image = _gray_buffer(image)
+        if psm != self.psm:
+            self.api.SetPageSegMode(psm)
+            self.psm = psm
+        height, width = image.shape
+        self.api.SetImageBytes(image.tobytes(), width, height, 1, image.strides[0])
+        return self.api.GetUTF8Text()
+
+    def close(self):
+        self.api.End()
+
+
+def _load_libtesseract():
+    names = [ctypes.util.find_library("tesseract"), "libtesseract.so.5", "libtesseract.so.4", "libtesseract.dylib"]
+    tesseract_cmd = find_tesseract()
+    if tesseract_cmd and os.name == "nt":
+        # The Windows installer puts the DLL next to tesseract.exe
+        names.extend(glob.glob(os.path.join(os.path.dirname(tesseract_cmd), "libtesseract*.dll")))
+    for name in names:
+        if not name:
+            continue
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            continue
+    raise OSError("libtesseract not found")
+
+
+class CAPIEngine:
+    # Persistent libtesseract handle through its C API with ctypes. The
+    # language model is loaded once; every call only passes a pointer to the
+    # numpy pixel buffer.
+    name = "capi"
+
+    def __init__(self, lang="eng", datapath=None):
+        lib = _load_libtesseract()
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIInit3.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPIInit3.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                            ctypes.c_int, ctypes.c_int]
+        lib.TessBaseAPISetSourceResolution.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+        self.lib = lib
+        self.handle = lib.TessBaseAPICreate()
+        datapath = (datapath or os.environ.get("TESSDATA_PREFIX") or "").encode() or None
+        if lib.TessBaseAPIInit3(self.handle, datapath, lang.encode()) != 0:
+            lib.TessBaseAPIDelete(self.handle)
+            self.handle = None
+            raise RuntimeError(f"Could not load the Tesseract language data for '{lang}'")
+        self.psm = None
+
+    def recognize(self, image, psm=6):
+        image = _gray_buffer(image)
+        if psm != self.psm:
+            self.lib.TessBaseAPISetPageSegMode(self.handle, psm)
+            self.psm = psm
+        height, width = image.shape
+        self.lib.TessBaseAPISetImage(self.handle, image.ctypes.data, width, height, 1, image.strides[0])
+        self.lib.TessBaseAPISetSourceResolution(self.handle, 300)
+        text_pointer = self.lib.TessBaseAPIGetUTF8Text(self.handle)
+        if not text_pointer:
+            return ""
+        try:
+            return ctypes.string_at(text_pointer).decode("utf-8", errors="replace")
+        finally:
+            self.lib.TessDeleteText(text_pointer)
+            self.lib.TessBaseAPIClear(self.handle)
+
+    def close(self):
+        if self.handle is not None:
+            self.lib.TessBaseAPIEnd(self.handle)
+            self.lib.TessBaseAPIDelete(self.handle)
+            self.handle = None
+
+
+ENGINES = {"tesserocr": TesserocrEngine, "capi": CAPIEngine, "pytesseract": PytesseractEngine}
+
+
+def create_engine(name=None, lang="eng"):
+    # The first backend that loads, in ENGINE_ORDER unless a name is given
+    name = name or os.environ.get("OCR_ENGINE")
+    names = [name] if name else ENGINE_ORDER
+    errors = []
+    for engine_name in names:
+        if engine_name not in ENGINES:
+            raise ValueError(f"Unknown OCR engine: {engine_name}")
+        try:
+            return ENGINES[engine_name](lang=lang)
+        except Exception as e:
+            errors.append(f"{engine_name}: {e}")
+    raise RuntimeError("No OCR engine available (" + "; ".join(errors) + ")")
+
+
+_local = threading.local()
+
+
+def get_engine(name=None):
+    # One engine per thread (and so per worker process), created on first
+    # use and kept for the life of the thread
+    engine = getattr(_local, "engine", None)
+    if engine is None or (name is not None and engine.name != name):
+        engine = create_engine(name)
+        _local.engine = engine
+    return engine
@@ -0,0 +1,241 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytesseract
+
+from ocr_engine import configure_tesseract, get_engine
+from text_regions import crop_regions, prepare_crop
+
+_engine_error = None
+
+
+class EngineUnavailable(RuntimeError):
+    # Raised by every job of a worker whose OCR engine failed to load
+    pass
+
+
+def _init_worker(tesseract_cmd, engine_name):
+    # Worker processes do not inherit settings made at import time on Windows.
+    # The engine (and its language model) is loaded once per worker here.
+    global _engine_error
+    configure_tesseract(tesseract_cmd)
+    try:
+        get_engine(engine_name)
+    except Exception as e:
+        # Keep the worker alive, its jobs report the error to the pool
+        _engine_error = str(e)
+
+
+def _warm_up_worker(delay):
+    # The engine is already loaded by _init_worker; holding the worker briefly
+    # makes the pool start and hand a job to every one of its workers
+    time.sleep(delay)
+    return os.getpid(), _engine_error
+
+
+def ocr_regions(regions, engine=None):
+    # Each crop holds a line or block of text, so let Tesseract treat it as one block
+    engine = engine or get_engine()
+    results = []
+    for box, crop in regions:
+        text = engine.recognize(prepare_crop(crop), psm=6)
+        if text.strip():
+            results.append((box, text))
+    return results
+
+
+def _ocr_regions_job(regions):
+    if _engine_error is not None:
+        raise EngineUnavailable(_engine_error)
+    return ocr_regions(regions)
+
+
+class OCRPool:
+    # Runs Tesseract in worker processes and hands the results back to the
+    # thread that calls dispatch_ready() (the Tk main loop). engine picks the
+    # OCR backend of the workers, None uses the first one available. available
+    # is None until a worker has answered and False once the engine failed to
+    # load; the pool then refuses new jobs. on_error(message) is called once
+    # per distinct failure, from the thread that submits and dispatches. A
+    # worker that dies (e.g. Tesseract crashed) breaks the executor; it is
+    # rebuilt up to max_restarts times, after that OCR is disabled.
+    def __init__(self, max_workers=None, max_pending=None, metrics=None, engine=None, on_error=None,
+                 max_restarts=3):
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 2) - 1)
+        self.max_workers = max_workers
+        self.max_pending = max_pending if max_pending is not None else 2 * max_workers
+        self.engine = engine
+        self.executor = None
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.results = queue.Queue()
+        self.metrics = metrics  # Records submit-to-result latency as the "ocr" stage
+        self.submitted_count = 0
+        self.rejected_count = 0   # Submissions refused because the pool was busy
+        self.completed_count = 0
+        self.failed_count = 0
+        self.available = None
+        self.error = None
+        self.on_error = on_error
+        self.reported = set()
+        self.max_restarts = max_restarts
+        self.restart_count = 0
+        self.generation = 0  # Counts executors, tells jobs of a broken one apart
+
+    def start(self):
+        if self.executor is None:
+            # Spawn, not fork: forking a process that runs Tk and capture threads is unsafe
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(pytesseract.pytesseract.tesseract_cmd, self.engine),
+            )
+        return self
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        with self.lock:
+            self.pending = 0
+
+    def warm_up(self, timeout=30.0):
+        # Starts every worker process and loads its engine now, so the first
+        # OCR job does not wait for process start-up and the language model.
+        # Returns the number of distinct workers that answered.
+        if self.executor is None:
+            self.start()
+        futures = [self.executor.submit(_warm_up_worker, 0.05) for _ in range(self.max_workers)]
+        pids = set()
+        errors = []
+        for future in futures:
+            try:
+                pid, error = future.result(timeout=timeout)
+            except Exception as e:
+                error = f"worker did not start: {e}"
+            else:
+                pids.add(pid)
+            if error is not None:
+                errors.append(error)
+        if len(errors) < len(futures):
+            self.available = True
+        else:
+            self.disable(errors[0])
+        return len(pids)
+
+    def _restart(self, error):
+        # Replaces a broken executor; its pending jobs have already failed
+        broken, self.executor = self.executor, None
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            self.pending = 0
+        if self.restart_count >= self.max_restarts:
+            self.disable(f"OCR workers died {self.restart_count + 1} times, last: {error}")
+            return
+        self.restart_count += 1
+        self.generation += 1
+        self.start()
+        self._report(f"OCR worker died, restarted the workers ({self.restart_count}/{self.max_restarts}): {error}")
+
+    def disable(self, error):
+        # Stops taking jobs; reported by the next dispatch_ready()
+        self.available = False
+        self.error = error
+
+    def busy(self):
+        with self.lock:
+            return self.pending >= self.max_pending
+
+    def submit_regions(self, gray_image, boxes, callback):
+        # OCR only the given (x, y, w, h) boxes; callback gets [(box, text), ...].
+        # Returns the future, or None when max_pending jobs are already queued;
+        # callers should simply skip the frame in that case.
+        return self.submit_call(_ocr_regions_job, (crop_regions(gray_image, boxes),), callback)
+
+    def submit_call(self, fn, args, callback):
+        if self.executor is None:
+            self.start()
+        with self.lock:
+            if self.pending >= self.max_pending or self.available is False:
+                self.rejected_count += 1
+                return None
+            self.pending += 1
+            self.submitted_count += 1
+            pending = self.pending
+        if self.metrics is not None:
+            self.metrics.set_gauge("ocr_backlog", pending)
+        submitted_at = time.perf_counter()
+        generation = self.generation
+        try:
+            future = self.executor.submit(fn, *args)
+        except BrokenProcessPool as e:
+            self.rejected_count += 1
+            self._restart(e)
+            return None
+        future.add_done_callback(lambda f: self._on_done(f, callback, submitted_at, generation))
+        return future
+
+    def _on_done(self, future, callback, submitted_at, generation):
+        with self.lock:
+            self.pending = max(0, self.pending - 1)
+            pending = self.pending
+        if self.metrics is not None:
+            self.metrics.observe("ocr", time.perf_counter() - submitted_at)
+            self.metrics.set_gauge("ocr_backlog", pending)
+        if future.cancelled():
+            return
+        self.results.put((future, callback, generation))
+
+    def dispatch_ready(self):
+        # Call from the UI thread; runs the callbacks of all finished jobs
+        dispatched = 0
+        while True:
+            try:
+                future, callback, generation = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.completed_count += 1
+            error = future.exception()
+            if error is None:
+                self.available = True
+                callback(future.result())
+            elif isinstance(error, EngineUnavailable):
+                self.disable(str(error))
+            elif isinstance(error, BrokenProcessPool):
+                self.failed_count += 1
+                if generation == self.generation and self.available is not False:
+                    self._restart(error)
+            else:
+                self.failed_count += 1
+                self._report(f"OCR job failed: {error}")
+            dispatched += 1
+        if self.available is False:
+            self._report(f"OCR disabled: {self.error}")
+        return dispatched
+
+    def _report(self, message):
+        if message not in self.reported:
+            self.reported.add(message)
+            if self.on_error is not None:
+                self.on_error(message)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.max_workers,
+                "pending": self.pending,
+                "submitted": self.submitted_count,
+                "rejected": self.rejected_count,
+                "completed": self.completed_count,
+                "failed": self.failed_count,
+                "restarts": self.restart_count,
+                "available": self.available,
+            }
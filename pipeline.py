@@ -0,0 +1,73 @@
+import threading
+import time
+
+import cv2
+
+from change_gate import FrameChangeGate
+from text_regions import crop_regions, find_text_regions
+
+
+class FramePipeline:
+    # The per-frame QR, OCR, color and weight analysis of the scanner apps
+    # without any Tk widgets. analyze() returns one plain dict per frame so the
+    # results can be written straight to JSON.
+    #
+    # The analyzers are created on first use, so importing this module loads
+    # neither pyzbar nor the color tables nor an OCR engine. ScannerCore gets
+    # its QR scanner and color classifier from a FramePipeline too; only the
+    # orchestration differs: analyze() runs every analyzer synchronously, for
+    # worker processes and batch jobs, while the apps schedule each analyzer
+    # at its own rate and send OCR crops to the OCRPool so Tk never waits.
+    def __init__(self, ocr=True, qr=True, color=True, change_threshold=None,
+                 qr_full_search_every=1, color_downsample=2, weight_fn=None):
+        self.ocr = ocr
+        self.qr = qr
+        self.color = color
+        self.change_gate = FrameChangeGate(threshold=change_threshold) if change_threshold is not None else None
+        self.qr_full_search_every = qr_full_search_every
+        self.color_downsample = color_downsample
+        self.weight_fn = weight_fn  # Returns the latest weight in kg, or None
+        self._qr_scanner = None
+        self._color_classifier = None
+        self._load_lock = threading.Lock()  # ScannerCore warms the analyzers up on another thread
+
+    @property
+    def qr_scanner(self):
+        with self._load_lock:
+            if self._qr_scanner is None:
+                from qr_scanner import QRScanner
+                self._qr_scanner = QRScanner(full_search_every=self.qr_full_search_every)
+            return self._qr_scanner
+
+    @property
+    def color_classifier(self):
+        with self._load_lock:
+            if self._color_classifier is None:
+                from color_lut import ColorClassifier
+                # Palette is compiled into lookup tables once instead of on every frame
+                self._color_classifier = ColorClassifier(downsample=self.color_downsample)
+            return self._color_classifier
+
+    def analyze(self, frame, frame_id=None, timestamp=None):
+        # Returns None when the change gate decides the frame is not worth analyzing
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.change_gate is not None and not self.change_gate.should_analyze(frame):
+            return None
+
+        result = {"frame": frame_id, "timestamp": timestamp}
+        if self.qr:
+            new_codes, detections = self.qr_scanner.scan(frame, timestamp)
+            result["qr"] = [{"text": text, "box": list(rect), "new": text in new_codes} for text, rect in detections]
+        if self.ocr:
+            from ocr_pool import ocr_regions
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            boxes = find_text_regions(gray)
+            regions = ocr_regions(crop_regions(gray, boxes)) if boxes else []
+            result["text"] = [{"text": text.strip(), "box": list(box)} for box, text in regions]
+        if self.color:
+            detected_color, counts = self.color_classifier.dominant_color(frame)
+            result["color"] = detected_color
+            result["color_counts"] = counts
+        if self.weight_fn is not None:
+            result["weight"] = self.weight_fn()
+        return result
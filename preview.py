@@ -0,0 +1,79 @@
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+from text_regions import draw_regions
+
+
+class PreviewRenderer:
+    # Draws camera frames into a Tk label without per-frame allocations: the
+    # frame is shrunk first, converted to RGBA into a preallocated buffer and
+    # pasted into one persistent PhotoImage. Renders at most max_fps times a
+    # second and not at all while the window is minimized or hidden.
+    def __init__(self, label, size=(400, 150), max_fps=15, overlay_fn=None, boxes_fn=None,
+                 interpolation=cv2.INTER_LINEAR):
+        self.label = label
+        self.size = size
+        self.interpolation = interpolation
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.overlay_fn = overlay_fn  # Returns a line of text to draw, or None
+        self.boxes_fn = boxes_fn      # Returns (x, y, w, h) boxes in frame pixels to outline
+        width, height = size
+        self.small = np.empty((height, width, 3), dtype=np.uint8)
+        # Four channels because PIL only shares memory with 32-bit buffers,
+        # so self.image always shows what was last written to self.rgba
+        self.rgba = np.empty((height, width, 4), dtype=np.uint8)
+        self.image = Image.frombuffer("RGBA", size, self.rgba, "raw", "RGBA", 0, 1)
+        self.photo = None
+        self.last_render = 0.0
+        self.rendered_count = 0
+        self.rate_skipped_count = 0
+        self.hidden_skipped_count = 0
+
+    def visible(self):
+        toplevel = self.label.winfo_toplevel()
+        return toplevel.state() not in ("iconic", "withdrawn") and self.label.winfo_viewable()
+
+    def render(self, frame):
+        # Returns True when the frame was drawn
+        now = time.perf_counter()
+        if now - self.last_render < self.min_interval:
+            self.rate_skipped_count += 1
+            return False
+        if not self.visible():
+            self.hidden_skipped_count += 1
+            return False
+        self.last_render = now
+        self.draw(frame)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(image=self.image)
+            self.label.config(image=self.photo)
+        else:
+            self.photo.paste(self.image)
+        self.rendered_count += 1
+        return True
+
+    def draw(self, frame):
+        # The pixel work of render(): fills self.image without touching Tk.
+        # Resizing first means the color conversion only touches preview pixels.
+        cv2.resize(frame, self.size, dst=self.small, interpolation=self.interpolation)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2RGBA, dst=self.rgba)
+        if self.boxes_fn is not None:
+            boxes = self.boxes_fn()
+            if boxes:
+                # Drawn on the preview buffer, the frame itself is shared with the recorder
+                scale_x = self.size[0] / frame.shape[1]
+                scale_y = self.size[1] / frame.shape[0]
+                draw_regions(self.rgba, [(int(x * scale_x), int(y * scale_y), int(w * scale_x), int(h * scale_y))
+                                         for x, y, w, h in boxes], color=(0, 255, 0, 255))
+        if self.overlay_fn is not None:
+            overlay = self.overlay_fn()
+            if overlay:
+                cv2.putText(self.rgba, overlay, (5, 12), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (255, 255, 0, 255), 1)
+        return self.image
+
+    def clear(self):
+        self.label.config(image='')
+        self.photo = None
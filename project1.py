@@ -1,15 +1,15 @@
 import tkinter as tk
 from tkinter import Label, Text, ttk, messagebox
 import cv2
-import pytesseract
-from PIL import Image, ImageTk
-import time
-from pyzbar import pyzbar
-import webbrowser
-import serial
-from fpdf import FPDF
+from frame_grabber import FrameGrabber
+from scanner_core import ScannerCore
+from session_store import EXPORT_FORMATS
+from ui_dispatcher import UIDispatcher, LogView, HistoryView
+from preview import PreviewRenderer
+from recording import ReplaySource
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# The analyzers (pyzbar, Tesseract, the scale) are imported by ScannerCore on
+# first use or by its background warm-up, not here
 
 class VideoTextExtractorApp:
 
@@ -18,19 +18,49 @@ class VideoTextExtractorApp:
         self.root.title("Video Text Extractor and QR Scanner")
         self.root.geometry("800x600")
         self.cap = None
-        self.frame_count = 0
-        self.extracted_text = ""
-        self.extracted_qr = ""
+        self.grabber = None
+        # Only the most recent items stay in memory, the full history is in the session store
+        self.recent_limit = 200
+        # Session store, metrics, gate, scheduler and the lazily loaded analyzers.
+        # 'R' requests a weight; adjust weight_port to your serial port. Set
+        # record_dir to keep every session's frames and weights for replay.
+        self.core = ScannerCore("scan_sessions.db", change_threshold=6.0, metrics_port=9108,
+                                weight_port='COM3', weight_mode="poll", weight_command=b'R', record_dir=None,
+                                log=self.log)
+        self.metrics = self.core.metrics
         self.qr_url = ""
         self.product_scan_count = 0  # Counter for QR code product scans
         self.text_scan_count = 0  # Counter for text scans
-        self.weight = 0.0  # Variable to store weight
-        self.camera_index = 0
-        self.weight_port = 'COM3'  # Adjust this to your serial port
-        self.serial_connection = None
+        self.replay_path = None  # Recorded session to play back instead of the camera
+        self.replay_speed = 1.0  # None plays the recording as fast as possible
+        self.show_metrics_overlay = False
         self.create_widgets()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Widget updates are batched and applied at most 10 times per second
+        self.ui = UIDispatcher(self.root, LogView(self.text_output, max_lines=500), max_rate_hz=10)
+        # The preview is redrawn at most 15 times per second, independent of the analysis rate
+        self.preview = PreviewRenderer(self.video_label, size=(500, 200), max_fps=15,
+                                       overlay_fn=self.preview_overlay, interpolation=cv2.INTER_AREA)
+        self.text_history = self.ui.add_history(HistoryView(self.digits_label, maxlen=self.recent_limit, separator=" "))
+        self.qr_history = self.ui.add_history(HistoryView(self.qr_label, maxlen=self.recent_limit, separator=" "))
+        self.extracted_text = self.text_history.items
+        self.extracted_qr = self.qr_history.items
+        self.ui.start()
+        self.start_metrics()
+
+        # Target rate, priority and time budget per analyzer. Analyzers that
+        # overrun are slowed down automatically; QR skips frames older than 250 ms.
+        self.scheduler = self.core.scheduler
+        self.scheduler.add("qr", self.detect_qr, rate_hz=10, priority=0, budget_ms=15.0, max_age=0.25)
+        self.scheduler.add("ocr_submit", self.extract_text_from_image, rate_hz=2, priority=1, budget_ms=10.0)
+        self.scheduler.add("weight", lambda frame: self.read_weight(), rate_hz=1, priority=2,
+                           needs_change=False, adaptive=False)
+        self.scheduler.add("status", lambda frame: self.update_status(), rate_hz=1, priority=3,
+                           needs_change=False, adaptive=False)
+        # Load the analyzers in the background while the window comes up
+        self.core.warm_up()
+
     def create_widgets(self):
         self.camera_label = tk.Label(self.root, text="Select Camera:")
         self.camera_label.grid(row=0, column=0, pady=10, padx=10)
@@ -57,6 +87,16 @@ class VideoTextExtractorApp:
         self.qr_label = tk.Label(self.root, text="", wraplength=780, anchor="w", justify="left")
         self.qr_label.grid(row=5, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
 
+        self.text_page_frame = tk.Frame(self.root)
+        self.text_page_frame.grid(row=4, column=2, pady=10, padx=10, sticky="n")
+        tk.Button(self.text_page_frame, text="Older", command=lambda: self.text_history.older()).pack(side="left")
+        tk.Button(self.text_page_frame, text="Newer", command=lambda: self.text_history.newer()).pack(side="left")
+
+        self.qr_page_frame = tk.Frame(self.root)
+        self.qr_page_frame.grid(row=5, column=2, pady=10, padx=10, sticky="n")
+        tk.Button(self.qr_page_frame, text="Older", command=lambda: self.qr_history.older()).pack(side="left")
+        tk.Button(self.qr_page_frame, text="Newer", command=lambda: self.qr_history.newer()).pack(side="left")
+
         self.open_link_button = tk.Button(self.root, text="Open QR Code Link", command=self.open_qr_link, bg='lightgreen', state='disabled')
         self.open_link_button.grid(row=6, column=0, columnspan=2, pady=10, padx=10)
 
@@ -69,28 +109,54 @@ class VideoTextExtractorApp:
         self.weight_label = tk.Label(self.root, text="Weight: 0.0 kg", wraplength=780, anchor="w", justify="left")
         self.weight_label.grid(row=9, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
 
-        self.generate_pdf_button = tk.Button(self.root, text="Generate PDF", command=self.generate_pdf, bg='lightyellow')
-        self.generate_pdf_button.grid(row=10, column=0, columnspan=2, pady=10, padx=10)
+        self.generate_pdf_button = tk.Button(self.root, text="Generate Report", command=self.generate_pdf, bg='lightyellow')
+        self.generate_pdf_button.grid(row=10, column=0, pady=10, padx=10)
+
+        self.report_format_selection = ttk.Combobox(self.root, values=[fmt.upper() for fmt in EXPORT_FORMATS], width=8, state="readonly")
+        self.report_format_selection.current(0)
+        self.report_format_selection.grid(row=10, column=1, pady=10, padx=10)
+
+        self.gate_label = tk.Label(self.root, text="Frames analyzed: 0, skipped: 0", wraplength=780, anchor="w", justify="left")
+        self.gate_label.grid(row=11, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
 
         self.root.grid_rowconfigure(2, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
         self.root.grid_columnconfigure(1, weight=1)
 
+    def start_metrics(self):
+        try:
+            self.core.start_metrics()
+        except OSError as e:
+            self.log(f"Failed to start metrics export: {e}")
+
     def start_scanning(self):
         if self.cap is not None:
-            self.text_output.insert(tk.END, "Already scanning...\n")
+            self.log("Already scanning...")
             return
 
-        self.camera_index = 0 if self.camera_selection.get() == "Front Camera" else 1
-
-        self.text_output.insert(tk.END, "Starting scanning...\n")
-        self.cap = cv2.VideoCapture(self.camera_index)
-        self.frame_count = 0
-        self.extracted_text = ""
-        self.extracted_qr = ""
+        self.log("Starting scanning...")
+        # The analyzers keep warming up in the background while the camera opens
+        self.core.warm_up()
+        if self.replay_path is not None:
+            self.core.camera = "replay"
+            self.cap = ReplaySource(self.replay_path, speed=self.replay_speed)
+            station = f"replay {self.replay_path}"
+            recorder = None
+        else:
+            self.core.camera = 0 if self.camera_selection.get() == "Front Camera" else 1
+            self.cap = cv2.VideoCapture(self.core.camera)
+            station = f"camera {self.core.camera}"
+            recorder = self.core.start_recording(station)
+        self.core.frame_count = 0
+        self.text_history.clear()
+        self.qr_history.clear()
         self.qr_url = ""
+        self.core.new_session(station=station)
         self.product_scan_count = 0  # Reset the QR code scan counter
         self.text_scan_count = 0  # Reset the text scan counter
+        self.grabber = FrameGrabber(self.cap, metrics=self.metrics, recorder=recorder).start()
+        self.core.qr_scanner.reset()
+        self.core.text_index.clear()
         self.connect_to_weight_machine()  # Connect to the weight machine
         self.scan_video()
 
@@ -98,134 +164,148 @@ class VideoTextExtractorApp:
         self.root.after(600000, self.stop_scanning)
 
     def stop_scanning(self):
+        if self.grabber is not None:
+            self.grabber.stop()
+            stats = self.grabber.stats()
+            self.log(f"Frames captured: {stats['captured']}, dropped: {stats['dropped']}, stale reads: {stats['stale']}")
+            self.grabber = None
+            self.log_analyzer_report()
+            recorded = self.core.stop_recording()
+            if recorded is not None:
+                path, stats = recorded
+                self.log(f"Recorded {stats['frames']} frames and {stats['weights']} weight readings to {path}")
         if self.cap is not None:
-            self.cap.release()
+            # Released by the grabber's thread once its last read returns
             self.cap = None
-            self.text_output.insert(tk.END, "Scanning stopped.\n")
-        if self.serial_connection is not None:
-            self.serial_connection.close()
-            self.serial_connection = None
+            self.log("Scanning stopped.")
+        self.core.close_weight()
 
     def on_closing(self):
         self.stop_scanning()
+        self.ui.stop()
+        self.core.shutdown()
         self.root.destroy()
 
     def connect_to_weight_machine(self):
-        try:
-            self.serial_connection = serial.Serial(self.weight_port, 9600, timeout=1)
-            self.text_output.insert(tk.END, "Connected to weight machine.\n")
-        except serial.SerialException as e:
-            self.text_output.insert(tk.END, f"Failed to connect to weight machine: {e}\n")
-
-    def get_weight(self):
-        if self.serial_connection is not None and self.serial_connection.is_open:
-            self.serial_connection.write(b'R')  # Assuming 'R' requests weight
-            weight_data = self.serial_connection.readline().decode('utf-8').strip()
-            try:
-                self.weight = float(weight_data)
-            except ValueError:
-                self.weight = 0.0
-            self.weight_label.config(text=f"Weight: {self.weight:.2f} kg")
-        else:
-            self.weight = 0.0
+        # The reader polls and reconnects on a background thread; a replay uses its recorded readings
+        self.core.open_weight(self.cap)
+        if self.replay_path is None:
+            self.log(f"Connecting to weight machine on {self.core.weight_port}...")
 
-    def resize_frame(self, frame, width, height):
-        resized_frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
-        return resized_frame
+    def read_weight(self):
+        # Latest cached reading; 0.0 when the scale is silent or disconnected
+        weight = self.core.poll_weight(max_age=5.0)
+        self.core.weight = weight if weight is not None else 0.0
+        self.ui.set_text(self.weight_label, f"Weight: {self.core.weight:.2f} kg")
 
     def show_frame(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = Image.fromarray(frame)
-        frame = ImageTk.PhotoImage(frame)
-        self.video_label.configure(image=frame)
-        self.video_label.image = frame
+        self.preview.render(frame)
+
+    def preview_overlay(self):
+        return self.metrics.summary() if self.show_metrics_overlay else None
 
     def extract_text_from_image(self, image):
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        text = pytesseract.image_to_string(gray_image)
-        return text
+        # OCR runs in the worker pool on the candidate text boxes only,
+        # the result arrives in handle_text_regions
+        return self.core.submit_ocr(image, self.handle_text_regions)
+
+    def handle_text_regions(self, regions):
+        for box, text in regions:
+            self.log(f"Text region {box}: {text.strip()}")
+        self.handle_text(" ".join(text.strip() for _, text in regions))
+
+    def handle_text(self, text):
+        if self.core.add_text(text):
+            self.text_history.add(text.replace('\n', ' '))
+            self.text_scan_count += 1  # Increment the text scan counter
+            self.ui.set_text(self.text_scan_count_label, f"Texts Scanned: {self.text_scan_count}")
+
+    def detect_qr(self, frame):
+        qr_data = self.extract_qr_from_image(frame)
+        if qr_data:
+            self.qr_history.add(qr_data.replace('\n', ' ').strip())
+            self.product_scan_count += 1  # Increment the QR code scan counter
+            self.ui.set_text(self.qr_scan_count_label, f"QR Codes Scanned: {self.product_scan_count}")
+            if "http://" in qr_data or "https://" in qr_data:
+                self.qr_url = qr_data.strip()
+                self.open_link_button.config(state='normal')
+            self.log(f"QR: {qr_data}")
+        return qr_data
+
+    def update_status(self):
+        self.ui.set_text(self.gate_label, self.core.status())
+        if self.grabber is not None:
+            self.metrics.set_gauge("dropped_frames", self.grabber.dropped_count)
+        self.metrics.set_gauge("analyze_skip_rate", self.core.change_gate.skip_rate())
+
+    def log_analyzer_report(self):
+        for line in self.core.report_lines():
+            self.log(line)
 
     def extract_qr_from_image(self, image):
-        decoded_objects = pyzbar.decode(image)
+        # Returns only the codes not seen before in this scanning session
         qr_data = ""
-        for obj in decoded_objects:
-            qr_data += obj.data.decode('utf-8') + " "
+        for qr_text in self.core.scan_qr(image):
+            qr_data += qr_text + " "
         return qr_data
 
     def scan_video(self):
-        if self.cap is None:
-            return 
+        if self.grabber is None:
+            return
+
+        self.core.dispatch_ocr()
 
-        ret, frame = self.cap.read()
-        if not ret:
+        if self.grabber.failed:
             self.stop_scanning()
             return
 
-        self.frame_count += 1
-        if self.frame_count % 50 == 0:
-            start_time = time.time()
-            frame = self.resize_frame(frame, 500, 200)
-
-            # Extract text from the frame
-            text = self.extract_text_from_image(frame)
-            if text.strip():
-                self.extracted_text += text.replace('\n', ' ') + ' '
-                self.text_scan_count += 1  # Increment the text scan counter
-                self.text_scan_count_label.config(text=f"Texts Scanned: {self.text_scan_count}")
-
-            # Extract QR code from the frame
-            qr_data = self.extract_qr_from_image(frame)
-            if qr_data:
-                self.extracted_qr += qr_data.replace('\n', ' ') + ' '
-                self.product_scan_count += 1  # Increment the QR code scan counter
-                self.qr_scan_count_label.config(text=f"QR Codes Scanned: {self.product_scan_count}")
-                if "http://" in qr_data or "https://" in qr_data:
-                    self.qr_url = qr_data.strip()
-                    self.open_link_button.config(state='normal')
-
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-            self.text_output.insert(tk.END, f"Text: {text} QR: {qr_data} (Time: {elapsed_time:.2f} sec)\n")
-            self.digits_label.config(text=self.extracted_text)
-            self.qr_label.config(text=self.extracted_qr)
+        latest = self.grabber.read_latest()
+        if latest is None:
+            # No new frame yet, check again shortly
+            self.root.after(5, self.scan_video)
+            return
+        _, timestamp, frame = latest
+
+        self.core.frame_count += 1
+        # The scheduler decides which analyzers are due on this frame
+        self.scheduler.run(frame, timestamp)
+
+        self.metrics.tick_frame()
+        with self.metrics.time("display"):
             self.show_frame(frame)
-            self.root.update_idletasks()
+        self.root.update_idletasks()
 
-        self.root.after(10, self.scan_video)
+        self.root.after(1, self.scan_video)
 
     def open_qr_link(self):
         if self.qr_url:
+            import webbrowser
             webbrowser.open(self.qr_url)
         else:
             messagebox.showinfo("No QR Code", "No QR Code link to open.")
 
-    def generate_pdf(self):
-        pdf = FPDF()
-        pdf.add_page()
-
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Scanned Data Report", ln=True, align='C')
-
-        pdf.ln(10)
-        pdf.cell(200, 10, txt="Extracted Text:", ln=True)
-        pdf.multi_cell(0, 10, txt=self.extracted_text)
+    def log(self, message):
+        self.ui.post_log(message)
 
-        pdf.ln(10)
-        pdf.cell(200, 10, txt="Extracted QR Codes:", ln=True)
-        pdf.multi_cell(0, 10, txt=self.extracted_qr)
-
-        pdf.ln(10)
-        pdf.cell(200, 10, txt=f"Number of Texts Scanned: {self.text_scan_count}", ln=True)
-
-        pdf.ln(10)
-        pdf.cell(200, 10, txt=f"Number of QR Codes Scanned: {self.product_scan_count}", ln=True)
-
-        pdf.ln(10)
-        pdf.cell(200, 10, txt=f"Current Weight: {self.weight:.2f} kg", ln=True)
-
-        pdf_output_path = "scanned_data_report.pdf"
-        pdf.output(pdf_output_path)
-        messagebox.showinfo("PDF Generated", f"PDF report has been generated and saved as {pdf_output_path}")
+    def generate_pdf(self):
+        # The report is written from the session store on a background thread
+        fmt = self.report_format_selection.get().lower()
+        report_output_path = f"scanned_data_report.{fmt}"
+        future = self.core.report_exporter.export(report_output_path, fmt)
+        self.generate_pdf_button.config(state='disabled')
+        self.root.after(200, self.check_report, future)
+
+    def check_report(self, future):
+        if not future.done():
+            self.root.after(200, self.check_report, future)
+            return
+        self.generate_pdf_button.config(state='normal')
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("Report Error", f"Failed to generate the report: {error}")
+            return
+        report_output_path, event_count = future.result()
+        messagebox.showinfo("Report Generated", f"Report with {event_count} events has been generated and saved as {report_output_path}")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,115 @@
+import time
+
+import cv2
+
+
+class SeenCodes:
+    # Hashed record of every code seen this session: text -> first/last seen and count
+    def __init__(self):
+        self.codes = {}
+
+    def add(self, text, timestamp=None):
+        # Returns True the first time a code is seen
+        timestamp = time.time() if timestamp is None else timestamp
+        entry = self.codes.get(text)
+        if entry is None:
+            self.codes[text] = {"first_seen": timestamp, "last_seen": timestamp, "count": 1}
+            return True
+        entry["last_seen"] = timestamp
+        entry["count"] += 1
+        return False
+
+    def __contains__(self, text):
+        return text in self.codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        # Codes in the order they were first seen
+        return iter(self.codes)
+
+
+class QRScanner:
+    # QR-only decoding on grayscale. While no code is tracked every frame gets
+    # a downscaled full-frame search. While codes are tracked, only the padded
+    # regions where they were last found are decoded at full resolution, with
+    # a full search every full_search_every frames for codes that came into
+    # view. Use full_search_every=1 to search every frame, e.g. for still images.
+    def __init__(self, scale_width=960, full_search_every=5, roi_padding=0.3, track_ttl=1.0):
+        self.scale_width = scale_width
+        self.full_search_every = full_search_every
+        self.roi_padding = roi_padding
+        self.track_ttl = track_ttl      # Seconds a tracked region survives without a decode
+        self.tracks = {}                # text -> {"rect": (x, y, w, h), "last_seen": t}
+        self.seen = SeenCodes()
+        self.frame_index = 0
+        self.full_searches = 0
+        self.roi_searches = 0
+
+    def _decode(self, gray):
+        # pyzbar needs the zbar library, loaded on the first decode
+        from pyzbar import pyzbar
+        from pyzbar.pyzbar import ZBarSymbol
+        return pyzbar.decode(gray, symbols=[ZBarSymbol.QRCODE])
+
+    def _full_search(self, gray):
+        self.full_searches += 1
+        height, width = gray.shape[:2]
+        scale = 1.0
+        search = gray
+        if width > self.scale_width:
+            scale = self.scale_width / width
+            search = cv2.resize(gray, (self.scale_width, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+        found = []
+        for obj in self._decode(search):
+            x, y, w, h = obj.rect
+            rect = (int(x / scale), int(y / scale), int(w / scale), int(h / scale))
+            found.append((obj.data.decode('utf-8'), rect))
+        return found
+
+    def _roi_search(self, gray):
+        self.roi_searches += 1
+        height, width = gray.shape[:2]
+        found = []
+        for x, y, w, h in [track["rect"] for track in self.tracks.values()]:
+            pad_x = int(w * self.roi_padding) + 8
+            pad_y = int(h * self.roi_padding) + 8
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            for obj in self._decode(gray[y0:y1, x0:x1]):
+                ox, oy, ow, oh = obj.rect
+                found.append((obj.data.decode('utf-8'), (x0 + ox, y0 + oy, ow, oh)))
+        return found
+
+    def scan(self, frame, timestamp=None):
+        # Returns (new_codes, detections): texts seen for the first time this
+        # session, and every (text, rect) decoded in this frame.
+        timestamp = time.time() if timestamp is None else timestamp
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        self.frame_index += 1
+
+        # Frames are often only analyzed while the scene changes, so a frame
+        # without tracked codes must never go undecoded
+        if not self.tracks or self.frame_index % self.full_search_every == 0:
+            detections = self._full_search(gray)
+        else:
+            detections = self._roi_search(gray)
+
+        new_codes = []
+        for text, rect in detections:
+            self.tracks[text] = {"rect": rect, "last_seen": timestamp}
+            if self.seen.add(text, timestamp):
+                new_codes.append(text)
+
+        # Forget regions where the code has not been decoded for a while
+        for text in [text for text, track in self.tracks.items() if timestamp - track["last_seen"] > self.track_ttl]:
+            del self.tracks[text]
+        return new_codes, detections
+
+    def reset(self):
+        self.tracks = {}
+        self.seen = SeenCodes()
+        self.frame_index = 0
@@ -0,0 +1,461 @@
+import argparse
+import json
+import mmap
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+INDEX_FILE = "index.bin"
+CHUNK_FILE = "chunk_{:05d}.bin"
+KIND_FRAME = 0
+KIND_WEIGHT = 1
+CODECS = {"raw": 0, "png": 1}
+DATA_ALIGN = 64
+# One fixed-size record per frame or weight reading, in the order they were
+# recorded. A record is only appended after its frame data is written, so a
+# recording cut off by a crash still reads up to its last complete record.
+INDEX_DTYPE = np.dtype([
+    ("kind", "u1"),
+    ("codec", "u1"),
+    ("channels", "u1"),
+    ("reserved", "u1"),
+    ("chunk", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("offset", "<u8"),
+    ("size", "<u8"),
+    ("seq", "<u8"),
+    ("timestamp", "<f8"),
+    ("value", "<f8"),     # Weight in kg for weight records, NaN for frames
+])
+_STOP = object()
+
+
+def is_recording(path):
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, META_FILE))
+
+
+class SessionRecorder:
+    # Streams frames and weight readings of a scanning session to disk on a
+    # background thread, so capture never waits for the disk. Frames are
+    # stored raw (BGR bytes, memory-mappable as they are) or as lossless PNG,
+    # in chunk files of at most chunk_bytes each. When the writer falls more
+    # than max_queue items behind, new frames are dropped and counted.
+    def __init__(self, path, codec="raw", chunk_bytes=256 * 1024 * 1024, max_queue=64, png_compression=1,
+                 metadata=None):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        self.path = path
+        self.codec = codec
+        self.chunk_bytes = chunk_bytes
+        self.png_compression = png_compression  # 0-9; 1 keeps encoding fast, still lossless
+        self.metadata = dict(metadata or {})
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.index_file = None
+        self.chunk_file = None
+        self.chunk = -1
+        self.chunk_size = 0
+        self.seq = 0
+        self.started = None
+        self.frame_count = 0
+        self.weight_count = 0
+        self.dropped_count = 0
+        self.bytes_written = 0
+        self.error = None
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        os.makedirs(self.path, exist_ok=True)
+        self.started = time.time()
+        self.index_file = open(os.path.join(self.path, INDEX_FILE), "wb")
+        self._write_meta()
+        self.thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+        if self.chunk_file is not None:
+            self.chunk_file.close()
+            self.chunk_file = None
+        self.index_file.close()
+        self.index_file = None
+        self._write_meta()
+
+    def write_frame(self, frame, timestamp=None, seq=None):
+        # Returns False when the frame was dropped. The frame must not be
+        # modified afterwards, it is written later on the recorder thread.
+        if self.thread is None:
+            return False
+        if seq is None:
+            self.seq += 1
+            seq = self.seq
+        try:
+            self.queue.put_nowait((KIND_FRAME, seq, time.time() if timestamp is None else timestamp, frame))
+            return True
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+
+    def write_weight(self, weight, timestamp=None):
+        if self.thread is None or weight is None:
+            return False
+        try:
+            self.queue.put_nowait((KIND_WEIGHT, 0, time.time() if timestamp is None else timestamp, weight))
+            return True
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._write(*item)
+            except Exception as e:
+                # Stop writing, e.g. on a full disk, but keep draining the queue
+                self.error = e
+
+    def _write(self, kind, seq, timestamp, payload):
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record["kind"] = kind
+        record["seq"] = seq
+        record["timestamp"] = timestamp
+        if kind == KIND_WEIGHT:
+            record["value"] = payload
+            self.weight_count += 1
+        else:
+            frame = np.ascontiguousarray(payload)
+            if self.codec == "png":
+                ok, encoded = cv2.imencode(".png", frame, [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression])
+                if not ok:
+                    raise IOError("PNG encoding failed")
+                data = encoded.data
+            else:
+                data = frame.data
+            chunk, offset = self._reserve(data.nbytes)
+            self.chunk_file.write(data)
+            self.chunk_size = offset + data.nbytes
+            self.bytes_written += data.nbytes
+            record["codec"] = CODECS[self.codec]
+            record["channels"] = 1 if frame.ndim == 2 else frame.shape[2]
+            record["height"], record["width"] = frame.shape[:2]
+            record["chunk"] = chunk
+            record["offset"] = offset
+            record["size"] = data.nbytes
+            record["value"] = np.nan
+            self.frame_count += 1
+        self.index_file.write(record.tobytes())
+        if kind == KIND_FRAME:
+            # Data first, then its record; a reader never sees a record without its data
+            self.chunk_file.flush()
+        self.index_file.flush()
+
+    def _reserve(self, size):
+        # (chunk, offset) for the next frame; starts a new chunk when this one is full
+        offset = self.chunk_size + -self.chunk_size % DATA_ALIGN
+        if self.chunk_file is None or (self.chunk_size and offset + size > self.chunk_bytes):
+            if self.chunk_file is not None:
+                self.chunk_file.close()
+            self.chunk += 1
+            self.chunk_file = open(os.path.join(self.path, CHUNK_FILE.format(self.chunk)), "wb")
+            self.chunk_size = 0
+            offset = 0
+        if offset > self.chunk_size:
+            self.chunk_file.write(b"\0" * (offset - self.chunk_size))
+        return self.chunk, offset
+
+    def _write_meta(self):
+        meta = dict(self.metadata, version=FORMAT_VERSION, codec=self.codec, created=self.started,
+                    frames=self.frame_count, weights=self.weight_count, dropped=self.dropped_count,
+                    bytes=self.bytes_written, chunks=self.chunk + 1)
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+
+    def stats(self):
+        return {
+            "frames": self.frame_count,
+            "weights": self.weight_count,
+            "dropped": self.dropped_count,
+            "backlog": self.queue.qsize(),
+            "bytes": self.bytes_written,
+            "error": str(self.error) if self.error is not None else None,
+        }
+
+
+class Recording:
+    # Read access to a recorded session. Chunks are memory-mapped on first
+    # use; raw frames come back as read-only views into the mapping, without
+    # a copy, and PNG frames are decoded.
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version: {self.meta.get('version')}")
+        with open(os.path.join(path, INDEX_FILE), "rb") as index_file:
+            raw = index_file.read()
+        usable = len(raw) - len(raw) % INDEX_DTYPE.itemsize
+        self.index = np.frombuffer(raw[:usable], dtype=INDEX_DTYPE)
+        self.chunks = {}
+        self.frame_rows = np.flatnonzero(self.index["kind"] == KIND_FRAME)
+
+    def __len__(self):
+        return len(self.frame_rows)
+
+    def duration(self):
+        if len(self.index) < 2:
+            return 0.0
+        return float(self.index["timestamp"][-1] - self.index["timestamp"][0])
+
+    def weights(self):
+        # [(timestamp, weight), ...] in recorded order
+        rows = self.index[self.index["kind"] == KIND_WEIGHT]
+        return list(zip(rows["timestamp"].tolist(), rows["value"].tolist()))
+
+    def _chunk(self, chunk):
+        mapping = self.chunks.get(chunk)
+        if mapping is None:
+            with open(os.path.join(self.path, CHUNK_FILE.format(chunk)), "rb") as chunk_file:
+                mapping = mmap.mmap(chunk_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.chunks[chunk] = mapping
+        return mapping
+
+    def decode(self, record):
+        mapping = self._chunk(int(record["chunk"]))
+        offset, size = int(record["offset"]), int(record["size"])
+        data = np.frombuffer(mapping, dtype=np.uint8, count=size, offset=offset)
+        if record["codec"] == CODECS["png"]:
+            return cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+        shape = (int(record["height"]), int(record["width"]))
+        if record["channels"] > 1:
+            shape += (int(record["channels"]),)
+        return data.reshape(shape)
+
+    def frame(self, index):
+        # (seq, timestamp, frame) of the index-th frame
+        record = self.index[self.frame_rows[index]]
+        return int(record["seq"]), float(record["timestamp"]), self.decode(record)
+
+    def close(self):
+        for mapping in self.chunks.values():
+            try:
+                mapping.close()
+            except BufferError:
+                pass  # A frame view is still alive, the mapping goes with it
+        self.chunks = {}
+
+
+class ReplaySource:
+    # Plays a recording back like a cv2.VideoCapture, so FrameGrabber and the
+    # apps can use it in place of a camera. speed 1.0 keeps the recorded
+    # timing, 2.0 plays twice as fast and None (or 0) as fast as frames can be
+    # read. Weight readings are replayed in their recorded order between the
+    # frames; weight_reader() offers them like a WeightReader.
+    def __init__(self, recording, speed=1.0, loop=False):
+        self.recording = recording if isinstance(recording, Recording) else Recording(recording)
+        self.speed = speed if speed and speed > 0 else None
+        self.loop = loop
+        self.row = 0
+        self.opened = True
+        self.clock_start = None
+        self.time_start = None
+        self.seq = None
+        self.timestamp = None        # Recorded timestamp of the last frame read
+        self.weight = None           # Recorded weight as of the last frame read
+        self.weight_timestamp = None
+        self.weight_replayed_at = None
+        self.frames_read = 0
+        self.frame = None
+
+    def isOpened(self):
+        return self.opened
+
+    def _next_record(self):
+        # Applies weight records up to the next frame and returns its record
+        index = self.recording.index
+        while True:
+            if self.row >= len(index):
+                if not self.loop or not len(self.recording):
+                    return None
+                self.row = 0
+                self.clock_start = None
+            record = index[self.row]
+            self.row += 1
+            if record["kind"] == KIND_FRAME:
+                return record
+            self.weight = float(record["value"])
+            self.weight_timestamp = float(record["timestamp"])
+            self.weight_replayed_at = time.time()
+
+    def grab(self):
+        if not self.opened:
+            return False
+        record = self._next_record()
+        if record is None:
+            return False
+        timestamp = float(record["timestamp"])
+        if self.speed is not None:
+            if self.clock_start is None:
+                self.clock_start, self.time_start = time.perf_counter(), timestamp
+            delay = self.clock_start + (timestamp - self.time_start) / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.seq, self.timestamp = int(record["seq"]), timestamp
+        self.frame = record
+        self.frames_read += 1
+        return True
+
+    def retrieve(self):
+        if self.frame is None:
+            return False, None
+        return True, self.recording.decode(self.frame)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def frames(self):
+        # Generator over (seq, recorded timestamp, frame), paced by speed
+        while self.grab():
+            yield self.seq, self.timestamp, self.recording.decode(self.frame)
+
+    def current_weight(self):
+        return self.weight
+
+    def weight_reader(self):
+        return ReplayWeightReader(self)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.recording))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frames_read)
+        if prop == cv2.CAP_PROP_FPS:
+            duration = self.recording.duration()
+            return (len(self.recording) - 1) / duration if duration else 0.0
+        if self.frame is not None and prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.frame["width"])
+        if self.frame is not None and prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.frame["height"])
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.opened = False
+        self.frame = None
+        self.recording.close()
+
+
+class ReplayWeightReader:
+    # The weight readings of a ReplaySource behind the WeightReader interface.
+    # Ages are measured from when a reading was replayed, as for a live scale.
+    def __init__(self, source):
+        self.source = source
+        self.last_error = None
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    @property
+    def connected(self):
+        return self.source.opened
+
+    def latest(self, max_age=None):
+        weight, replayed_at = self.source.weight, self.source.weight_replayed_at
+        if replayed_at is None or (max_age is not None and time.time() - replayed_at > max_age):
+            return None, None
+        return weight, replayed_at
+
+    def latest_weight(self, max_age=None):
+        return self.latest(max_age)[0]
+
+
+def record_camera(source, path, duration=None, codec="raw", weight_reader=None):
+    # Records a camera or video file until it ends, duration runs out or Ctrl+C
+    cap = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not cap.isOpened():
+        raise IOError(f"Failed to open video source: {source}")
+    recorder = SessionRecorder(path, codec=codec, metadata={"source": str(source)}).start()
+    if weight_reader is not None:
+        # Every reading as it arrives, also those a streaming scale sends between frames
+        weight_reader.on_reading = recorder.write_weight
+    start_time = time.time()
+    try:
+        while duration is None or time.time() - start_time < duration:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            recorder.write_frame(frame)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if weight_reader is not None:
+            weight_reader.on_reading = None
+        cap.release()
+        recorder.stop()
+    return recorder.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record scanning sessions and replay them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="record a camera or video file")
+    record_parser.add_argument("source", help="camera index or video file")
+    record_parser.add_argument("path", help="directory to write the recording to")
+    record_parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    record_parser.add_argument("--codec", choices=list(CODECS), default="raw")
+    record_parser.add_argument("--weight-port", default=None, help="serial port of the scale to record")
+    info_parser = commands.add_parser("info", help="print what a recording holds")
+    info_parser.add_argument("path")
+    replay_parser = commands.add_parser("replay", help="read a recording back and report the frame rate")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", type=float, default=0.0, help="1.0 = recorded timing, 0 = as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        weight_reader = None
+        if args.weight_port:
+            from weight_reader import WeightReader
+            weight_reader = WeightReader(args.weight_port).start()
+        try:
+            stats = record_camera(args.source, args.path, args.duration, args.codec, weight_reader)
+        finally:
+            if weight_reader is not None:
+                weight_reader.stop()
+        print(f"Recorded {stats['frames']} frames and {stats['weights']} weight readings, "
+              f"{stats['dropped']} dropped, {stats['bytes'] / 1e6:.1f} MB", file=sys.stderr)
+    elif args.command == "info":
+        recording = Recording(args.path)
+        print(json.dumps(dict(recording.meta, indexed_frames=len(recording), duration=recording.duration()), indent=2))
+    else:
+        replay = ReplaySource(args.path, speed=args.speed)
+        start_time = time.perf_counter()
+        count = sum(1 for _ in replay.frames())
+        elapsed_time = time.perf_counter() - start_time
+        replay.release()
+        print(f"Replayed {count} frames in {elapsed_time:.2f} sec ({count / max(elapsed_time, 1e-9):.1f} frames/s)",
+              file=sys.stderr)
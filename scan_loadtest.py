@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import aiohttp
+import cv2
+import numpy as np
+
+from benchmark import synthetic_frame
+
+
+def load_payload(image=None, size="640x480", frame_format="jpeg"):
+    # Returns (payload bytes, query options) for one frame, sent on every request
+    if image is not None:
+        frame = cv2.imread(image)
+        if frame is None:
+            raise IOError(f"Could not read image: {image}")
+    else:
+        width, height = (int(value) for value in size.lower().split("x"))
+        frame = synthetic_frame(width, height)
+    if frame_format == "raw":
+        height, width, channels = frame.shape
+        options = {"format": "raw", "width": width, "height": height, "channels": channels}
+        return np.ascontiguousarray(frame).tobytes(), options
+    ok, encoded = cv2.imencode(".png" if frame_format == "png" else ".jpg", frame)
+    if not ok:
+        raise IOError("Image encoding failed")
+    return encoded.tobytes(), {}
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.batch_sizes = []
+        self.errors = {}
+        self.started = None
+        self.finished = None
+
+    def ok(self, latency, result):
+        self.latencies.append(latency)
+        if "batch_size" in result:
+            self.batch_sizes.append(result["batch_size"])
+
+    def error(self, reason):
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def report(self):
+        elapsed = max((self.finished or time.perf_counter()) - self.started, 1e-9)
+        latencies = np.array(self.latencies) * 1000.0
+        report = {
+            "requests": len(self.latencies) + sum(self.errors.values()),
+            "ok": len(self.latencies),
+            "errors": dict(self.errors),
+            "elapsed_s": elapsed,
+            "throughput_rps": len(self.latencies) / elapsed,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else None,
+        }
+        if len(latencies):
+            report.update({
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p90_ms": float(np.percentile(latencies, 90)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "max_ms": float(np.max(latencies)),
+            })
+        return report
+
+
+def _error_reason(result):
+    error = result.get("error", "unknown")
+    return "overloaded" if error.startswith("overloaded") else error.split(":")[0]
+
+
+async def http_client(session, url, payload, params, deadline, stats):
+    # One request at a time, like a station posting its frames in a loop
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.post(url + "/scan", data=payload, params=params,
+                                    headers={"Content-Type": "application/octet-stream"}) as response:
+                result = await response.json()
+                if response.status == 200:
+                    stats.ok(time.perf_counter() - start, result)
+                else:
+                    stats.error(_error_reason(result) if response.status != 503 else "overloaded")
+                    if response.status == 503:
+                        await asyncio.sleep(0.01)
+        except aiohttp.ClientError as e:
+            stats.error(type(e).__name__)
+            await asyncio.sleep(0.1)
+
+
+async def ws_client(session, url, payload, params, deadline, stats, window):
+    # Streams frames over one WebSocket with up to window frames unanswered
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://") + "/ws"
+    async with session.ws_connect(ws_url, max_msg_size=0) as ws:
+        await ws.send_str(json.dumps(params))
+        sent = {}
+        credit = asyncio.Semaphore(window)
+        next_id = 0
+
+        async def receive():
+            async for message in ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    break
+                result = json.loads(message.data)
+                start = sent.pop(result.get("id"), None)
+                if start is None:
+                    stats.error(_error_reason(result))
+                    continue
+                credit.release()
+                if "error" in result:
+                    stats.error(_error_reason(result))
+                else:
+                    stats.ok(time.perf_counter() - start, result)
+                if not sent and time.perf_counter() >= deadline:
+                    break
+
+        receiver = asyncio.create_task(receive())
+        while time.perf_counter() < deadline and not receiver.done():
+            await credit.acquire()
+            next_id += 1
+            sent[next_id] = time.perf_counter()
+            await ws.send_bytes(payload)
+        if sent:
+            await asyncio.wait_for(receiver, timeout=30.0)
+        else:
+            receiver.cancel()
+        await ws.close()
+
+
+async def run_load(url, clients=8, duration=10.0, mode="http", window=1, payload=b"", options=None):
+    params = dict(options or {})
+    stats = LoadStats()
+    timeout = aiohttp.ClientTimeout(total=60.0)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        stats.started = time.perf_counter()
+        deadline = stats.started + duration
+        if mode == "ws":
+            tasks = [ws_client(session, url, payload, params, deadline, stats, window) for _ in range(clients)]
+        else:
+            query = {key: str(value) for key, value in params.items()}
+            tasks = [http_client(session, url, payload, query, deadline, stats) for _ in range(clients)]
+        await asyncio.gather(*tasks)
+        stats.finished = time.perf_counter()
+        try:
+            async with session.get(url + "/stats") as response:
+                server = await response.json()
+        except aiohttp.ClientError:
+            server = None
+    report = stats.report()
+    report["server"] = server
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure throughput and tail latency of scan_server.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--mode", choices=["http", "ws"], default="http")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--window", type=int, default=1, help="frames in flight per WebSocket client")
+    parser.add_argument("--image", default=None, help="image to send (default: a synthetic frame)")
+    parser.add_argument("--size", default="640x480", help="size of the synthetic frame")
+    parser.add_argument("--format", choices=["jpeg", "png", "raw"], default="jpeg")
+    parser.add_argument("--analyzers", default="qr,ocr,color")
+    parser.add_argument("-o", "--output", default=None, help="save the report as JSON")
+    args = parser.parse_args()
+
+    payload, options = load_payload(args.image, args.size, args.format)
+    options["analyzers"] = args.analyzers
+    report = asyncio.run(run_load(args.url, args.clients, args.duration, args.mode, args.window, payload, options))
+    print(f"{report['ok']} ok, {sum(report['errors'].values())} errors in {report['elapsed_s']:.1f} s: "
+          f"{report['throughput_rps']:.1f} req/s", file=sys.stderr)
+    if report["ok"]:
+        print(f"latency p50 {report['p50_ms']:.1f} ms, p90 {report['p90_ms']:.1f} ms, "
+              f"p99 {report['p99_ms']:.1f} ms, max {report['max_ms']:.1f} ms", file=sys.stderr)
+    for reason, count in report["errors"].items():
+        print(f"error {reason}: {count}", file=sys.stderr)
+    if report["server"]:
+        server = report["server"]
+        print(f"server: {server['workers']} workers, mean batch {server['mean_batch_size'] or 0:.2f}, "
+              f"batch sizes {server['batch_sizes']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
@@ -0,0 +1,433 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from aiohttp import WSMsgType, web
+
+from metrics import Metrics
+from ocr_engine import ENGINE_ORDER, configure_tesseract, get_engine
+from pipeline import FramePipeline
+
+ANALYZERS = ("qr", "ocr", "color")
+MAX_FRAME_BYTES = 64 * 1024 * 1024  # Raw 4k BGR is 25 MB
+
+log = logging.getLogger("scan_server")
+
+_pipeline = None
+_ocr_error = None  # Why a worker cannot serve an analyzer, reported to the server through _worker_info
+_qr_error = None
+
+
+class Overloaded(Exception):
+    pass
+
+
+def _init_worker(tesseract_cmd, engine_name):
+    # One pipeline per worker process, with its OCR engine and zbar loaded once
+    global _pipeline, _ocr_error, _qr_error
+    configure_tesseract(tesseract_cmd)
+    if engine_name:
+        os.environ["OCR_ENGINE"] = engine_name
+    try:
+        get_engine()
+    except Exception as e:
+        _ocr_error = str(e)
+    # Frames of different clients are unrelated: no change gate, and a full QR search on every frame
+    _pipeline = FramePipeline(ocr=_ocr_error is None, change_threshold=None, qr_full_search_every=1)
+    try:
+        _pipeline.qr_scanner._decode(np.zeros((16, 16), dtype=np.uint8))
+    except Exception as e:
+        _qr_error = str(e)
+
+
+def _worker_info():
+    return {"pid": os.getpid(), "ocr": _ocr_error is None, "qr": _qr_error is None,
+            "ocr_error": _ocr_error, "qr_error": _qr_error}
+
+
+def decode_frame(payload, frame_format=None, width=None, height=None, channels=3):
+    # Encoded images (JPEG, PNG, anything cv2.imdecode reads) or raw 8-bit
+    # pixels in BGR, BGRA or gray, returned as a BGR frame
+    if frame_format == "raw":
+        if not width or not height:
+            raise ValueError("Raw frames need a width and a height")
+        if len(payload) != width * height * channels:
+            raise ValueError(f"Expected {width * height * channels} bytes for a {width}x{height}x{channels} frame, "
+                             f"got {len(payload)}")
+        frame = np.frombuffer(payload, dtype=np.uint8)
+        if channels == 1:
+            return cv2.cvtColor(frame.reshape(height, width), cv2.COLOR_GRAY2BGR)
+        frame = frame.reshape(height, width, channels)
+        if channels == 4:
+            return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        if channels != 3:
+            raise ValueError(f"Unsupported channel count: {channels}")
+        return frame
+    frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode the image")
+    return frame
+
+
+def analyze_batch(items):
+    # Runs in a worker process. items is [(payload, frame_format, analyzers)],
+    # returns [(result, error)] in the same order.
+    results = []
+    for payload, frame_format, analyzers in items:
+        start = time.perf_counter()
+        try:
+            frame = decode_frame(payload, **frame_format)
+            _pipeline.qr = "qr" in analyzers and _qr_error is None
+            _pipeline.ocr = "ocr" in analyzers and _ocr_error is None
+            _pipeline.color = "color" in analyzers
+            if _pipeline.qr:
+                _pipeline.qr_scanner.reset()  # Every frame stands on its own, codes are always reported
+            result = _pipeline.analyze(frame)
+            del result["frame"]
+            # null marks an analyzer that was asked for but is not available on this host
+            if "qr" in analyzers and _qr_error is not None:
+                result["qr"] = None
+            if "ocr" in analyzers and _ocr_error is not None:
+                result["text"] = None
+            result["width"], result["height"] = frame.shape[1], frame.shape[0]
+            result["analyze_ms"] = (time.perf_counter() - start) * 1000.0
+            results.append((result, None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class MicroBatcher:
+    # Merges the frames of all clients into batches of up to max_batch and
+    # runs each batch in one call to a worker process, so the per-call cost
+    # of the process pool is shared by the whole batch. One batch per worker
+    # is in flight; while all workers are busy the next batch keeps filling,
+    # so batches grow with the load and stay small when it is quiet. A batch
+    # waits at most max_wait_ms for more frames once a worker is free.
+    # submit() fails fast with Overloaded when max_queue frames are waiting.
+    def __init__(self, workers=None, max_batch=8, max_wait_ms=2.0, max_queue=256, tesseract_cmd=None,
+                 ocr_engine=None, metrics=None):
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.tesseract_cmd = tesseract_cmd
+        self.ocr_engine = ocr_engine
+        self.metrics = metrics if metrics is not None else Metrics(prefix="scan_server")
+        self.executor = None
+        self.queue = None
+        self.arrived = None
+        self.slots = None
+        self.task = None
+        self.batches = set()
+        self.worker_info = []
+        self.frame_count = 0
+        self.batch_count = 0
+        self.error_count = 0
+        self.overloaded_count = 0
+        self.batch_sizes = {}
+        self.latencies = deque(maxlen=10000)  # Seconds from submit to result, for exact percentiles
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.arrived = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(configure_tesseract(self.tesseract_cmd), self.ocr_engine))
+        # Start every worker and load its engine before the first request arrives
+        self.worker_info = await asyncio.gather(
+            *[loop.run_in_executor(self.executor, _worker_info) for _ in range(self.workers)])
+        for name, label in (("ocr", "OCR engine"), ("qr", "QR decoder (zbar)")):
+            if not any(info[name] for info in self.worker_info):
+                log.warning("%s unavailable, requests get null for it: %s", label,
+                            self.worker_info[0][name + "_error"])
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.batches:
+            await asyncio.gather(*self.batches, return_exceptions=True)
+        while self.queue is not None and not self.queue.empty():
+            item = self.queue.get_nowait()
+            if not item[3].done():
+                item[3].set_exception(Overloaded("Server is shutting down"))
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def ocr_available(self):
+        return any(info["ocr"] for info in self.worker_info)
+
+    def qr_available(self):
+        return any(info["qr"] for info in self.worker_info)
+
+    async def submit(self, payload, frame_format=None, analyzers=ANALYZERS):
+        # Returns the result dict; raises ValueError for frames that cannot be
+        # analyzed and Overloaded when the queue is full
+        if self.queue.qsize() >= self.max_queue:
+            self.overloaded_count += 1
+            self.metrics.inc("overloaded")
+            raise Overloaded(f"{self.queue.qsize()} frames are already waiting")
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((payload, dict(frame_format or {}), tuple(analyzers), future, time.perf_counter()))
+        self.arrived.set()
+        self.metrics.set_gauge("queue_depth", self.queue.qsize())
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                # While every worker is busy, more frames pile up for this batch
+                await self.slots.acquire()
+                deadline = batch[0][4] + self.max_wait
+                while len(batch) < self.max_batch:
+                    if not self.queue.empty():
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self.arrived.clear()
+                    try:
+                        await asyncio.wait_for(self.arrived.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                for item in batch:
+                    if not item[3].done():
+                        item[3].set_exception(Overloaded("Server is shutting down"))
+                raise
+            # Clients that gave up do not need their frame analyzed
+            batch = [item for item in batch if not item[3].done()]
+            if not batch:
+                self.slots.release()
+                continue
+            self.metrics.set_gauge("queue_depth", self.queue.qsize())
+            task = loop.create_task(self._run_batch(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        for item in batch:
+            self.metrics.observe("queue_wait", started - item[4])
+        try:
+            results = await loop.run_in_executor(
+                self.executor, analyze_batch, [(payload, frame_format, analyzers)
+                                               for payload, frame_format, analyzers, _, _ in batch])
+        except Exception as e:
+            # The worker died or the pool is shutting down; fail the whole batch
+            results = [(None, f"{type(e).__name__}: {e}")] * len(batch)
+        finally:
+            self.slots.release()
+        self.metrics.observe("batch", time.perf_counter() - started)
+        self.batch_count += 1
+        self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+        done = time.perf_counter()
+        for (_, _, _, future, enqueued), (result, error) in zip(batch, results):
+            self.frame_count += 1
+            self.metrics.observe("request", done - enqueued)
+            self.latencies.append(done - enqueued)
+            self.metrics.tick_frame()
+            if future.done():
+                continue
+            if error is not None:
+                self.error_count += 1
+                future.set_exception(ValueError(error))
+            else:
+                result["batch_size"] = len(batch)
+                result["latency_ms"] = (done - enqueued) * 1000.0
+                future.set_result(result)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000.0
+        return {
+            "workers": self.workers,
+            "ocr": self.ocr_available(),
+            "qr": self.qr_available(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "frames": self.frame_count,
+            "batches": self.batch_count,
+            "mean_batch_size": self.frame_count / self.batch_count if self.batch_count else None,
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "errors": self.error_count,
+            "overloaded": self.overloaded_count,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        }
+
+
+def parse_analyzers(text):
+    if not text:
+        return ANALYZERS
+    analyzers = tuple(name.strip() for name in text.split(",") if name.strip())
+    unknown = [name for name in analyzers if name not in ANALYZERS]
+    if unknown:
+        raise ValueError(f"Unknown analyzers: {', '.join(unknown)}")
+    return analyzers
+
+
+def parse_frame_format(options, content_type=None):
+    # Raw pixels when format=raw is given or the body is application/octet-stream
+    # with a width and height; anything else is decoded as an image file
+    frame_format = options.get("format")
+    if frame_format is None and content_type == "application/octet-stream" and options.get("width"):
+        frame_format = "raw"
+    if frame_format not in (None, "raw", "image"):
+        raise ValueError(f"Unknown frame format: {frame_format}")
+    if frame_format != "raw":
+        return {}
+    try:
+        return {"frame_format": "raw", "width": int(options["width"]), "height": int(options["height"]),
+                "channels": int(options.get("channels", 3))}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Raw frames need integer width, height and channels")
+
+
+async def handle_scan(request):
+    # POST /scan?analyzers=qr,color with an image file, or raw pixels with
+    # ?format=raw&width=640&height=480&channels=3
+    batcher = request.app["batcher"]
+    try:
+        frame_format = parse_frame_format(request.query, request.content_type)
+        analyzers = parse_analyzers(request.query.get("analyzers"))
+        payload = await request.read()
+        if not payload:
+            raise ValueError("Empty request body")
+        result = await batcher.submit(payload, frame_format, analyzers)
+    except Overloaded as e:
+        return web.json_response({"error": f"overloaded: {e}"}, status=503, headers={"Retry-After": "1"})
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response(result)
+
+
+async def handle_stream(request):
+    # WebSocket at /ws. Every binary message is one frame and is answered
+    # with one JSON text message carrying its "id" (1, 2, ... per connection).
+    # Replies can arrive out of order. A text message such as
+    # {"format": "raw", "width": 640, "height": 480, "channels": 3,
+    #  "analyzers": "qr,color"} applies to the frames sent after it.
+    # The server stops reading while max_inflight frames are pending.
+    app = request.app
+    batcher = app["batcher"]
+    ws = web.WebSocketResponse(max_msg_size=MAX_FRAME_BYTES, heartbeat=30.0)
+    await ws.prepare(request)
+    inflight = asyncio.Semaphore(app["max_inflight"])
+    send_lock = asyncio.Lock()
+    pending = set()
+    frame_format, analyzers = {}, ANALYZERS
+    frame_id = 0
+
+    async def send(message):
+        async with send_lock:
+            if not ws.closed:
+                await ws.send_str(json.dumps(message))
+
+    async def process(frame_id, payload, frame_format, analyzers):
+        try:
+            result = await batcher.submit(payload, frame_format, analyzers)
+            result["id"] = frame_id
+        except Overloaded as e:
+            result = {"id": frame_id, "error": f"overloaded: {e}"}
+        except ValueError as e:
+            result = {"id": frame_id, "error": str(e)}
+        finally:
+            inflight.release()
+        await send(result)
+
+    async for message in ws:
+        if message.type == WSMsgType.TEXT:
+            try:
+                options = json.loads(message.data)
+                frame_format = parse_frame_format(options)
+                analyzers = parse_analyzers(options.get("analyzers"))
+            except (ValueError, AttributeError) as e:
+                await send({"error": f"Invalid configuration: {e}"})
+        elif message.type == WSMsgType.BINARY:
+            await inflight.acquire()
+            frame_id += 1
+            task = asyncio.create_task(process(frame_id, message.data, frame_format, analyzers))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        elif message.type == WSMsgType.ERROR:
+            break
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return ws
+
+
+async def handle_health(request):
+    batcher = request.app["batcher"]
+    return web.json_response({"status": "ok", "workers": batcher.workers, "ocr": batcher.ocr_available(),
+                              "qr": batcher.qr_available()})
+
+
+async def handle_stats(request):
+    return web.json_response(request.app["batcher"].stats())
+
+
+async def handle_metrics(request):
+    return web.Response(text=request.app["batcher"].metrics.render_prometheus(), content_type="text/plain")
+
+
+def create_app(workers=None, max_batch=8, max_wait_ms=2.0, max_queue=256, max_inflight=8, tesseract_cmd=None,
+               ocr_engine=None):
+    app = web.Application(client_max_size=MAX_FRAME_BYTES)
+    app["batcher"] = MicroBatcher(workers, max_batch, max_wait_ms, max_queue, tesseract_cmd, ocr_engine)
+    app["max_inflight"] = max_inflight
+
+    async def start_batcher(app):
+        await app["batcher"].start()
+
+    async def stop_batcher(app):
+        await app["batcher"].stop()
+
+    app.on_startup.append(start_batcher)
+    app.on_cleanup.append(stop_batcher)
+    app.router.add_post("/scan", handle_scan)
+    app.router.add_get("/ws", handle_stream)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the QR, OCR and color analyzers over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="analyzer processes (default: all but one core)")
+    parser.add_argument("--max-batch", type=int, default=8, help="most frames analyzed in one worker call")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="longest wait for a batch to fill")
+    parser.add_argument("--max-queue", type=int, default=256, help="waiting frames before answering 503")
+    parser.add_argument("--max-inflight", type=int, default=8, help="pending frames per WebSocket connection")
+    parser.add_argument("--tesseract-cmd", default=None, help="path to the tesseract executable (default: search)")
+    parser.add_argument("--ocr-engine", choices=ENGINE_ORDER, default=None,
+                        help="OCR backend (default: the first available of " + ", ".join(ENGINE_ORDER) + ")")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)  # A line per frame would slow the server down
+    web.run_app(create_app(args.workers, args.max_batch, args.max_wait_ms, args.max_queue, args.max_inflight,
+                           args.tesseract_cmd, args.ocr_engine),
+                host=args.host, port=args.port)
@@ -0,0 +1,283 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from change_gate import FrameChangeGate
+from metrics import Metrics, MetricsServer, MetricsFileDumper
+from pipeline import FramePipeline
+from scheduler import AnalyzerScheduler
+from session_store import SessionStore, ReportExporter
+from text_index import NearDuplicateIndex
+
+
+class ScannerCore:
+    # Everything the scanner apps share that is not a widget: the session
+    # store, metrics, change gate, scheduler, text index, weight reader and
+    # the analyzers. The QR scanner and color classifier come from the same
+    # FramePipeline class the worker processes use. The analyzers and their
+    # heavy imports (pyzbar, the Tesseract engine, the color tables, the OCR
+    # worker processes) are only created on first use; warm_up() creates them
+    # on a background thread while the window is already up and the camera is
+    # opening.
+    def __init__(self, db_path="scan_sessions.db", change_threshold=6.0, text_threshold=0.7, ocr_workers=None,
+                 color_downsample=2,
+                 metrics_port=9108, metrics_file=None, weight_port=None, weight_mode="poll", weight_command=b'W',
+                 record_dir=None, record_codec="raw", log=None):
+        self.change_threshold = change_threshold  # Mean pixel difference needed before a frame is analyzed again
+        self.text_threshold = text_threshold      # Bigram similarity at which two reads are the same text
+        self.ocr_workers = ocr_workers            # None uses all but one CPU core
+        self.color_downsample = color_downsample
+        self.metrics_port = metrics_port          # Prometheus text at http://127.0.0.1:9108/metrics, None to disable
+        self.metrics_file = metrics_file          # Path to dump the metrics to every 10 seconds
+        self.weight_port = weight_port
+        self.weight_mode = weight_mode            # "stream" for scales that send readings continuously
+        self.weight_command = weight_command
+        self.record_dir = record_dir              # Every scanning session is recorded here for replay, None to disable
+        self.record_codec = record_codec          # "raw" or the smaller, slower "png"
+        self.recorder = None
+        self.log = log                            # log(message) for problems the user should see, UI thread only
+        self.metrics = Metrics()
+        self.session_store = SessionStore(db_path)
+        self.report_exporter = ReportExporter(self.session_store)
+        self.change_gate = FrameChangeGate(threshold=change_threshold)
+        self.scheduler = AnalyzerScheduler(frame_budget_ms=33.0, change_gate=self.change_gate, metrics=self.metrics)
+        # Every text read this session; OCR jitter of a known text only adds a hit
+        self.text_index = NearDuplicateIndex(threshold=text_threshold)
+        self.metrics_server = None
+        self.metrics_dumper = None
+        self.weight_reader = None
+        self.weight = 0.0
+        self.weight_timestamp = None
+        self.frame_count = 0
+        self.camera = 0
+        self.tesseract_cmd = None
+        # The scheduler runs each analyzer on its own; the pipeline only holds
+        # them, its change gate and synchronous OCR stay unused here
+        self.pipeline = FramePipeline(ocr=False, qr_full_search_every=5, color_downsample=color_downsample)
+        self._ocr_pool = None
+        self._load_lock = threading.RLock()
+        self.warm_up_thread = None
+        self.warm_up_seconds = None
+        self.warm_up_errors = {}          # Analyzer name -> why it failed to load
+        self.messages = queue.Queue()     # For self.log, from threads other than the UI thread
+        self.ready = threading.Event()
+
+    # Analyzers, created on first use
+
+    @property
+    def qr_scanner(self):
+        return self.pipeline.qr_scanner  # Also keeps the hashed set of seen codes
+
+    @property
+    def color_classifier(self):
+        return self.pipeline.color_classifier
+
+    @property
+    def ocr_pool(self):
+        with self._load_lock:
+            if self._ocr_pool is None:
+                from ocr_engine import configure_tesseract
+                from ocr_pool import OCRPool
+                # Finds tesseract through TESSERACT_CMD, the PATH or the default Windows install
+                self.tesseract_cmd = configure_tesseract()
+                self._ocr_pool = OCRPool(max_workers=self.ocr_workers, metrics=self.metrics,
+                                         on_error=self.log).start()
+            return self._ocr_pool
+
+    def warm_up(self):
+        # Loads every analyzer on a background thread; the first frame then
+        # does not pay for imports, table building or worker start-up
+        if self.warm_up_thread is None:
+            self.warm_up_thread = threading.Thread(target=self._warm_up, name="ScannerWarmUp", daemon=True)
+            self.warm_up_thread.start()
+        return self.warm_up_thread
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        frame = np.full((120, 160, 3), 127, dtype=np.uint8)
+        gray = frame[:, :, 0].copy()
+
+        def find_text_regions(gray):
+            from text_regions import find_text_regions
+            return find_text_regions(gray)
+
+        # QR first, it is the analyzer the first frames need soonest. Each
+        # analyzer on its own, so one that cannot load does not keep the
+        # others cold.
+        steps = [
+            ("QR", lambda: self.qr_scanner._decode(gray)),
+            ("color", lambda: self.color_classifier.dominant_color(frame)),
+            ("text regions", lambda: find_text_regions(gray)),
+            ("OCR", lambda: self.ocr_pool.warm_up()),
+        ]
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                self.warm_up_errors[name] = e
+                self.messages.put(f"{name} analyzer unavailable: {e}")
+        self.warm_up_seconds = time.perf_counter() - start
+        self.ready.set()
+
+    def wait_ready(self, timeout=None):
+        if self.warm_up_thread is None:
+            return True
+        return self.ready.wait(timeout)
+
+    # Per-frame work shared by the apps
+
+    def report_messages(self):
+        # Hands what background threads had to say to self.log, call from the UI thread
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if self.log is not None:
+                self.log(message)
+
+    def dispatch_ocr(self):
+        # Runs the callbacks of finished OCR jobs and reports background
+        # problems, call from the UI thread
+        self.report_messages()
+        if self._ocr_pool is not None:
+            self._ocr_pool.dispatch_ready()
+
+    def submit_ocr(self, frame, callback):
+        # Sends the candidate text boxes of the frame to the OCR workers;
+        # callback gets [(box, text), ...]. None when skipped, or when the
+        # workers have no OCR engine.
+        if self.ocr_pool.available is False or self.ocr_pool.busy():
+            return None
+        import cv2
+        from text_regions import find_text_regions
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        boxes = find_text_regions(gray)
+        if not boxes:
+            return None
+        return self.ocr_pool.submit_regions(gray, boxes, callback)
+
+    def scan_qr(self, frame):
+        # Records and returns the codes never seen before in this session
+        new_codes, _ = self.qr_scanner.scan(frame)
+        for qr_text in new_codes:
+            self.record_event("qr", qr_text)
+        return new_codes
+
+    def add_text(self, text, camera=None, frame_id=None):
+        # Records the text, or a hit on the text seen first when it is a
+        # near-duplicate of it, so the report can count the reads of each text
+        entry, is_new = self.text_index.add(text)
+        if entry is not None:
+            self.record_event("text" if is_new else "text_hit", entry["text"], camera=camera, frame_id=frame_id)
+        return is_new
+
+    def record_event(self, kind, value, timestamp=None, camera=None, frame_id=None):
+        # Every event is tagged with the frame number, the camera and the current weight
+        self.session_store.record(kind, value, frame_id=self.frame_count if frame_id is None else frame_id,
+                                  weight=self.weight, camera=str(self.camera if camera is None else camera),
+                                  timestamp=timestamp)
+
+    # Session, metrics and scale
+
+    def new_session(self, station):
+        self.session_store.new_session(station=station)
+        self.scheduler.reset()
+
+    def start_metrics(self):
+        if self.metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metrics, self.metrics_port).start()
+        if self.metrics_file is not None:
+            self.metrics_dumper = MetricsFileDumper(self.metrics, self.metrics_file).start()
+
+    def stop_metrics(self):
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.stop()
+            self.metrics_dumper = None
+
+    def start_recording(self, station):
+        # Returns the recorder to hand to the FrameGrabber, or None when not recording
+        if self.record_dir is None:
+            return None
+        from recording import SessionRecorder
+        path = os.path.join(self.record_dir, time.strftime("session_%Y%m%d_%H%M%S"))
+        self.recorder = SessionRecorder(path, codec=self.record_codec, metadata={"station": station}).start()
+        return self.recorder
+
+    def stop_recording(self):
+        # Returns (path, stats) of the finished recording, or None
+        if self.recorder is None:
+            return None
+        recorder, self.recorder = self.recorder, None
+        recorder.stop()
+        return recorder.path, recorder.stats()
+
+    def open_weight(self, cap=None):
+        # The scale is read on a background thread that also reconnects on its
+        # own. A replayed recording brings its own weight readings.
+        if self.weight_reader is not None:
+            return
+        if hasattr(cap, "weight_reader"):
+            self.weight_reader = cap.weight_reader().start()
+            return
+        if self.weight_port is None:
+            return
+        from weight_reader import WeightReader
+        self.weight_reader = WeightReader(self.weight_port, mode=self.weight_mode, command=self.weight_command)
+        self.weight_reader.on_reading = self._record_weight_reading
+        self.weight_reader.start()
+
+    def _record_weight_reading(self, weight, timestamp):
+        # Runs on the reader thread for every reading, so the recording also
+        # has the readings of a streaming scale between two polls
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.write_weight(weight, timestamp)
+
+    def close_weight(self):
+        if self.weight_reader is not None:
+            self.weight_reader.stop()
+            self.weight_reader = None
+
+    def poll_weight(self, max_age=5.0):
+        # Only reads the cached value, never waits for the scale. Returns the
+        # latest weight or None; a new reading is recorded as a weight event.
+        if self.weight_reader is None:
+            return None
+        weight, timestamp = self.weight_reader.latest(max_age=max_age)
+        if weight is None:
+            return None
+        self.weight = weight
+        if timestamp != self.weight_timestamp:
+            self.weight_timestamp = timestamp
+            self.record_event("weight", None, timestamp=timestamp)
+        return weight
+
+    def report_lines(self):
+        lines = []
+        for name, stats in self.scheduler.report().items():
+            skipped = ", ".join(f"{reason} {count}" for reason, count in stats["skipped"].items() if count)
+            lines.append(f"Analyzer {name}: ran {stats['runs']} times ({stats['rate_hz']:.1f} Hz)"
+                         + (f", skipped: {skipped}" if skipped else ""))
+        lines.append(f"Texts: {self.text_index.summary()}")
+        return lines
+
+    def status(self):
+        return f"{self.change_gate.summary()}\nAnalyzers: {self.scheduler.summary()}"
+
+    def shutdown(self):
+        self.stop_recording()
+        self.close_weight()
+        if self._ocr_pool is not None:
+            self._ocr_pool.shutdown()
+            self._ocr_pool = None
+        self.stop_metrics()
+        self.report_exporter.shutdown()
+        self.session_store.close()
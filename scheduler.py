@@ -0,0 +1,167 @@
+import time
+
+
+class AnalyzerTask:
+    # One analyzer with its target rate, priority and per-run time budget.
+    # interval is the current minimum time between runs; it grows when the
+    # analyzer overruns its budget and shrinks back towards the target rate
+    # when it is fast again.
+    def __init__(self, name, fn, rate_hz=None, priority=0, budget_ms=10.0, needs_change=True,
+                 max_age=None, min_rate_hz=None, adaptive=True):
+        self.name = name
+        self.fn = fn                      # fn(frame) -> result
+        self.rate_hz = rate_hz            # None runs on every frame
+        self.priority = priority          # Lower runs first
+        self.budget_ms = budget_ms
+        self.needs_change = needs_change  # Only run on frames the change gate lets through
+        self.max_age = max_age            # Skip frames captured longer ago than this (seconds)
+        self.adaptive = adaptive
+        self.base_interval = 1.0 / rate_hz if rate_hz else 0.0
+        if min_rate_hz:
+            self.max_interval = 1.0 / min_rate_hz
+        else:
+            self.max_interval = max(self.base_interval * 8, 1.0)
+        self.interval = self.base_interval
+        self.last_run = None
+        self.changed = True               # Scene changed since this task last ran
+        self.mean_ms = None               # Moving average of the run time
+        self.run_count = 0
+        self.over_budget_count = 0
+        self.skipped = {"rate": 0, "unchanged": 0, "stale": 0, "budget": 0}
+
+    def due(self, now):
+        return self.last_run is None or now - self.last_run >= self.interval
+
+    def overdue(self, now):
+        # Past the slowest allowed rate, runs even when the frame budget is used up
+        return self.last_run is None or now - self.last_run >= self.max_interval
+
+    def slow_down(self):
+        if self.adaptive:
+            self.interval = min(max(self.interval, 0.01) * 1.5, self.max_interval)
+
+    def speed_up(self):
+        if self.adaptive and self.interval > self.base_interval:
+            self.interval = max(self.base_interval, self.interval / 1.25)
+
+    def current_rate(self):
+        return 1.0 / self.interval if self.interval else None
+
+
+class AnalyzerScheduler:
+    # Decides per frame which analyzers run. Each task runs at most at its
+    # target rate, in priority order, while the frame budget lasts. Tasks that
+    # overrun their own budget, or the most expensive task of a frame that
+    # overran the frame budget, are slowed down automatically and recover
+    # once there is time again. Frames older than a task's max_age are
+    # skipped for that task.
+    def __init__(self, frame_budget_ms=33.0, change_gate=None, metrics=None):
+        self.frame_budget_ms = frame_budget_ms
+        self.change_gate = change_gate
+        self.metrics = metrics  # Run times are recorded as one stage per task name
+        self.tasks = []
+        self.frames = 0
+        self.over_budget_frames = 0
+        self.started = time.time()
+
+    def add(self, name, fn, **options):
+        task = AnalyzerTask(name, fn, **options)
+        self.tasks.append(task)
+        self.tasks.sort(key=lambda item: item.priority)
+        return task
+
+    def reset(self):
+        self.frames = 0
+        self.over_budget_frames = 0
+        self.started = time.time()
+        for task in self.tasks:
+            task.interval = task.base_interval
+            task.last_run = None
+            task.changed = True
+            task.run_count = 0
+            task.over_budget_count = 0
+            task.skipped = dict.fromkeys(task.skipped, 0)
+        if self.change_gate is not None:
+            self.change_gate.reset()
+
+    def run(self, frame, timestamp=None):
+        # Returns {task name: result} for the tasks that ran on this frame
+        now = time.time()
+        timestamp = now if timestamp is None else timestamp
+        self.frames += 1
+        changed = None
+        spent_ms = 0.0
+        results = {}
+        ran = []
+        for task in self.tasks:
+            if not task.due(now):
+                task.skipped["rate"] += 1
+                continue
+            if task.max_age is not None and now - timestamp > task.max_age:
+                task.skipped["stale"] += 1
+                continue
+            if task.needs_change:
+                if changed is None:
+                    # Only computed when a task that cares is due. The gate
+                    # moves its reference on every change, so the change is
+                    # remembered per task until that task has run once.
+                    changed = self.change_gate is None or self.change_gate.should_analyze(frame)
+                    if changed:
+                        for other in self.tasks:
+                            other.changed = True
+                if not task.changed:
+                    task.skipped["unchanged"] += 1
+                    continue
+            expected_ms = task.mean_ms or 0.0
+            if spent_ms + expected_ms > self.frame_budget_ms and not task.overdue(now):
+                task.skipped["budget"] += 1
+                continue
+
+            start = time.perf_counter()
+            results[task.name] = task.fn(frame)
+            elapsed = time.perf_counter() - start
+            elapsed_ms = elapsed * 1000.0
+            spent_ms += elapsed_ms
+            if self.metrics is not None:
+                self.metrics.observe(task.name, elapsed)
+            task.mean_ms = elapsed_ms if task.mean_ms is None else 0.8 * task.mean_ms + 0.2 * elapsed_ms
+            task.last_run = now
+            task.changed = False
+            task.run_count += 1
+            if elapsed_ms > task.budget_ms:
+                task.over_budget_count += 1
+                task.slow_down()
+            elif elapsed_ms < task.budget_ms / 2:
+                task.speed_up()
+            ran.append(task)
+
+        if spent_ms > self.frame_budget_ms and ran:
+            # Falling behind: back off the most expensive analyzer of this frame
+            self.over_budget_frames += 1
+            max(ran, key=lambda item: item.mean_ms or 0.0).slow_down()
+        return results
+
+    def report(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        return {
+            task.name: {
+                "runs": task.run_count,
+                "rate_hz": task.run_count / elapsed,
+                "target_hz": task.rate_hz,
+                "current_hz": task.current_rate(),
+                "mean_ms": task.mean_ms,
+                "over_budget": task.over_budget_count,
+                "skipped": dict(task.skipped),
+            }
+            for task in self.tasks
+        }
+
+    def summary(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        parts = []
+        for task in self.tasks:
+            if task.rate_hz:
+                parts.append(f"{task.name} {task.run_count / elapsed:.1f}/{task.rate_hz:g} Hz")
+            else:
+                parts.append(f"{task.name} {task.run_count / elapsed:.1f} Hz")
+        return ", ".join(parts)
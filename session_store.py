@@ -0,0 +1,264 @@
+import csv
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+EVENT_KINDS = ("text", "text_hit", "qr", "color", "weight")  # text_hit: another read of a text, value is the text
+EXPORT_FORMATS = ("pdf", "csv", "jsonl")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    station TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    frame_id INTEGER,
+    kind TEXT NOT NULL,
+    value TEXT,
+    weight REAL,
+    camera TEXT
+);
+CREATE INDEX IF NOT EXISTS events_session_kind_ts ON events (session_id, kind, ts);
+"""
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    # WAL keeps readers (exports) from blocking the writer; NORMAL sync is
+    # still durable against application crashes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SessionStore:
+    # Append-only SQLite store for scan events. record() only puts the event
+    # on a queue; a writer thread inserts them in batches and commits at least
+    # every flush_interval seconds, so the UI never waits on disk.
+    def __init__(self, path="scan_sessions.db", batch_size=500, flush_interval=0.25):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        connection = _connect(path)
+        connection.executescript(SCHEMA)
+        connection.commit()
+        connection.close()
+        self.events = queue.Queue()
+        self.session_id = None
+        self.written_count = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, name="SessionStoreWriter", daemon=True)
+        self.thread.start()
+
+    def new_session(self, station=None):
+        connection = _connect(self.path)
+        with connection:
+            cursor = connection.execute("INSERT INTO sessions (started, station) VALUES (?, ?)", (time.time(), station))
+        connection.close()
+        self.session_id = cursor.lastrowid
+        return self.session_id
+
+    def record(self, kind, value, frame_id=None, weight=None, camera=None, timestamp=None):
+        if self.session_id is None:
+            self.new_session()
+        timestamp = time.time() if timestamp is None else timestamp
+        self.events.put((self.session_id, timestamp, frame_id, kind, value, weight, camera))
+
+    def flush(self, timeout=5.0):
+        # Blocks until everything recorded so far is committed
+        done = threading.Event()
+        self.events.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self.running:
+            self.running = False
+            self.events.put(None)
+            self.thread.join(timeout=5.0)
+
+    def _writer(self):
+        connection = _connect(self.path)
+        batch = []
+        waiters = []
+        stopping = False
+        while not stopping:
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.events.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+            if batch:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO events (session_id, ts, frame_id, kind, value, weight, camera) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+                self.written_count += len(batch)
+                batch = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+        connection.close()
+
+    def reader(self):
+        # Separate connection for queries, safe to use from another thread
+        connection = _connect(self.path)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def sessions(self):
+        connection = self.reader()
+        try:
+            return [dict(row) for row in connection.execute("SELECT * FROM sessions ORDER BY id")]
+        finally:
+            connection.close()
+
+
+def iter_events(connection, session_id, kind=None, chunk_size=1000):
+    # Streams events in insertion order without loading the session into memory
+    query = "SELECT id, ts, frame_id, kind, value, weight, camera FROM events WHERE session_id = ?"
+    params = [session_id]
+    if kind is not None:
+        query += " AND kind = ?"
+        params.append(kind)
+    cursor = connection.execute(query + " ORDER BY id", params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def session_summary(connection, session_id):
+    counts = dict(connection.execute(
+        "SELECT kind, COUNT(*) FROM events WHERE session_id = ? GROUP BY kind", (session_id,)).fetchall())
+    colors = connection.execute(
+        "SELECT value, COUNT(*) FROM events WHERE session_id = ? AND kind = 'color' GROUP BY value ORDER BY 2 DESC",
+        (session_id,)).fetchall()
+    text_hits = connection.execute(
+        "SELECT value, COUNT(*) FROM events WHERE session_id = ? AND kind = 'text_hit' GROUP BY value",
+        (session_id,)).fetchall()
+    last_weight = connection.execute(
+        "SELECT weight FROM events WHERE session_id = ? AND kind = 'weight' ORDER BY id DESC LIMIT 1",
+        (session_id,)).fetchone()
+    return {
+        "counts": counts,
+        "colors": [(row[0], row[1]) for row in colors],
+        "text_hits": {row[0]: row[1] for row in text_hits},  # Reads after the first, per text
+        "last_weight": last_weight[0] if last_weight else None,
+    }
+
+
+def _row_dict(row):
+    return {"id": row[0], "timestamp": row[1], "frame": row[2], "kind": row[3],
+            "value": row[4], "weight": row[5], "camera": row[6]}
+
+
+def export_csv(connection, session_id, path):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as output:
+        writer = csv.writer(output)
+        writer.writerow(["id", "timestamp", "frame", "kind", "value", "weight", "camera"])
+        for row in iter_events(connection, session_id):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export_jsonl(connection, session_id, path):
+    count = 0
+    with open(path, "w", encoding="utf-8") as output:
+        for row in iter_events(connection, session_id):
+            output.write(json.dumps(_row_dict(row)) + "\n")
+            count += 1
+    return count
+
+
+def _pdf_text(text):
+    # The core PDF fonts only cover latin-1
+    return text.encode("latin-1", errors="replace").decode("latin-1")
+
+
+def export_pdf(connection, session_id, path):
+    from fpdf import FPDF
+
+    summary = session_summary(connection, session_id)
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="Scanned Data Report", ln=True, align='C')
+    pdf.cell(200, 10, txt=f"Number of Texts Scanned: {summary['counts'].get('text', 0)}", ln=True)
+    pdf.cell(200, 10, txt=f"Repeated Text Reads: {summary['counts'].get('text_hit', 0)}", ln=True)
+    pdf.cell(200, 10, txt=f"Number of QR Codes Scanned: {summary['counts'].get('qr', 0)}", ln=True)
+    if summary["last_weight"] is not None:
+        pdf.cell(200, 10, txt=f"Current Weight: {summary['last_weight']:.2f} kg", ln=True)
+
+    count = 0
+    for kind, title in (("text", "Scanned Texts"), ("qr", "Scanned QR Codes")):
+        pdf.add_page()
+        pdf.cell(200, 10, txt=title, ln=True, align='C')
+        pdf.set_font("Arial", size=9)
+        for row in iter_events(connection, session_id, kind):
+            stamp = time.strftime("%H:%M:%S", time.localtime(row[1]))
+            reads = summary["text_hits"].get(row[4], 0) + 1 if kind == "text" else 1
+            pdf.multi_cell(0, 5, txt=_pdf_text(f"{stamp}  {row[4]}" + (f"  ({reads} reads)" if reads > 1 else "")))
+            count += 1
+        pdf.set_font("Arial", size=12)
+
+    pdf.add_page()
+    pdf.cell(200, 10, txt="Detected Colors", ln=True, align='C')
+    for color, color_count in summary["colors"]:
+        pdf.cell(0, 10, txt=_pdf_text(f"{color}: {color_count}"), ln=True)
+
+    pdf.add_page()
+    pdf.cell(200, 10, txt="Weight Measurements", ln=True, align='C')
+    pdf.set_font("Arial", size=9)
+    for row in iter_events(connection, session_id, "weight"):
+        stamp = time.strftime("%H:%M:%S", time.localtime(row[1]))
+        pdf.cell(0, 5, txt=f"{stamp}  {row[5]:.2f} kg", ln=True)
+        count += 1
+    pdf.output(path)
+    return count
+
+
+EXPORTERS = {"pdf": export_pdf, "csv": export_csv, "jsonl": export_jsonl}
+
+
+class ReportExporter:
+    # Writes reports on a background thread from a separate read connection;
+    # export() returns a Future that resolves to (path, event_count).
+    def __init__(self, store):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ReportExporter")
+
+    def export(self, path, fmt="pdf", session_id=None):
+        if fmt not in EXPORTERS:
+            raise ValueError(f"Unknown report format: {fmt}")
+        session_id = self.store.session_id if session_id is None else session_id
+        return self.executor.submit(self._export, path, fmt, session_id)
+
+    def _export(self, path, fmt, session_id):
+        self.store.flush()
+        connection = self.store.reader()
+        try:
+            return path, EXPORTERS[fmt](connection, session_id, path)
+        finally:
+            connection.close()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+import pytest
+
+from benchmark import synthetic_frame
+from color_lut import ColorClassifier, reference_color_counts
+
+
+@pytest.mark.parametrize("shape", [(7, 5, 3), (480, 640, 3), (1080, 1920, 3)])
+def test_counts_match_the_inrange_reference(shape):
+    frame = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    assert ColorClassifier().count_colors(frame) == reference_color_counts(frame)
+
+
+def test_counts_match_on_a_scene():
+    frame = synthetic_frame(640, 480)
+    assert ColorClassifier().count_colors(frame) == reference_color_counts(frame)
+
+
+@pytest.mark.parametrize("downsample", [2, 4])
+def test_downsampled_counts_are_those_of_the_smaller_frame(downsample):
+    # Not the full-frame counts: only every n-th pixel in each direction is counted
+    frame = np.random.default_rng(1).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    small = cv2.resize(frame, None, fx=1.0 / downsample, fy=1.0 / downsample, interpolation=cv2.INTER_NEAREST)
+    counts = ColorClassifier(downsample=downsample).count_colors(frame)
+    assert counts == reference_color_counts(small)
+    assert counts != reference_color_counts(frame)
+
+
+def test_labels_follow_palette_order():
+    classifier = ColorClassifier()
+    frame = np.full((2, 2, 3), (0, 0, 200), dtype=np.uint8)  # Pure red in BGR
+    assert (classifier.classify(frame) == classifier.names.index("Red")).all()
+    assert classifier.dominant_color(frame)[0] == "Red"
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import numpy as np
+
+from frame_grabber import FrameGrabber
+
+
+class SlowCapture:
+    # Stands in for a camera whose read() blocks longer than the grabber's join
+    def __init__(self, read_delay=0.0, frames=None):
+        self.read_delay = read_delay
+        self.frames = frames
+        self.reading = False
+        self.read_after_release = False
+        self.released_while_reading = False
+        self.released = threading.Event()
+        self.release_thread = None
+
+    def read(self):
+        if self.released.is_set():
+            self.read_after_release = True
+        self.reading = True
+        time.sleep(self.read_delay)
+        self.reading = False
+        if self.frames is not None:
+            if self.frames == 0:
+                return False, None
+            self.frames -= 1
+        return True, np.zeros((4, 4, 3), np.uint8)
+
+    def release(self):
+        self.released_while_reading = self.reading
+        self.release_thread = threading.current_thread()
+        self.released.set()
+
+
+def test_capture_is_released_by_its_thread_after_the_last_read():
+    cap = SlowCapture(read_delay=1.5)
+    grabber = FrameGrabber(cap).start()
+    time.sleep(0.1)
+    grabber.stop()  # Gives up on the join while read() is still blocked
+    assert not cap.released.is_set()
+    assert cap.released.wait(3.0)
+    assert cap.release_thread is not threading.current_thread()
+    assert not cap.released_while_reading
+    assert not cap.read_after_release
+
+
+def test_capture_is_released_when_it_runs_out_of_frames():
+    cap = SlowCapture(frames=3)
+    grabber = FrameGrabber(cap).start()
+    assert cap.released.wait(3.0)
+    assert grabber.failed
+    assert grabber.stats()["captured"] == 3
+
+
+def test_stop_without_start_releases_the_capture():
+    cap = SlowCapture()
+    FrameGrabber(cap).stop()
+    assert cap.released.is_set()
@@ -0,0 +1,68 @@
+import os
+import time
+
+from ocr_pool import OCRPool
+
+
+def _crash():
+    # Like Tesseract taking its worker process down
+    os._exit(1)
+
+
+def _answer(value):
+    return value
+
+
+def _dispatch_until(pool, condition, timeout=30.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        pool.dispatch_ready()
+        time.sleep(0.05)
+    return condition()
+
+
+def test_dead_worker_restarts_the_pool():
+    messages = []
+    results = []
+    pool = OCRPool(max_workers=1, on_error=messages.append).start()
+    try:
+        assert pool.submit_call(_crash, (), results.append) is not None
+        assert _dispatch_until(pool, lambda: pool.restart_count == 1)
+        assert pool.available is not False
+        assert pool.submit_call(_answer, (7,), results.append) is not None
+        assert _dispatch_until(pool, lambda: results == [7])
+    finally:
+        pool.shutdown()
+    assert len(messages) == 1 and "restarted" in messages[0]
+
+
+def test_workers_that_keep_dying_disable_ocr():
+    messages = []
+    pool = OCRPool(max_workers=1, on_error=messages.append, max_restarts=1).start()
+    try:
+        for restarts in (1, 2):
+            assert pool.submit_call(_crash, (), None) is not None
+            assert _dispatch_until(pool, lambda: pool.failed_count == restarts)
+        assert pool.available is False
+        assert pool.submit_call(_answer, (1,), None) is None
+    finally:
+        pool.shutdown()
+    assert messages[-1].startswith("OCR disabled")
+
+
+def test_submitting_to_a_broken_pool_restarts_it():
+    messages = []
+    results = []
+    pool = OCRPool(max_workers=1, on_error=messages.append).start()
+    try:
+        crashed = pool.submit_call(_crash, (), None)
+        while not crashed.done():
+            time.sleep(0.05)
+        # Not dispatched yet: the broken executor refuses the job instead of raising
+        assert pool.submit_call(_answer, (3,), results.append) is None
+        assert pool.restart_count == 1
+        assert pool.submit_call(_answer, (4,), results.append) is not None
+        assert _dispatch_until(pool, lambda: results == [4])
+    finally:
+        pool.shutdown()
+    assert len(messages) == 1
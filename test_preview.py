@@ -0,0 +1,21 @@
+import numpy as np
+
+from preview import PreviewRenderer
+
+GREEN = [0, 255, 0, 255]
+
+
+def test_text_boxes_are_scaled_onto_the_preview():
+    boxes = []
+    renderer = PreviewRenderer(None, size=(400, 150), boxes_fn=lambda: boxes)
+    frame = np.zeros((300, 800, 3), np.uint8)
+    assert not np.asarray(renderer.draw(frame))[..., 1].any()
+
+    boxes.append((100, 40, 200, 60))
+    image = np.asarray(renderer.draw(frame))
+    # Half size: the box covers x 50..150, y 20..50 of the preview
+    assert image[20, 100].tolist() == GREEN
+    assert image[50, 100].tolist() == GREEN
+    assert image[35, 50].tolist() == GREEN
+    assert image[35, 100].tolist() != GREEN
+    assert not frame.any()
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from qr_scanner import QRScanner
+
+
+class FakeDecodeScanner(QRScanner):
+    # Decodes a "code" wherever the image has a white pixel, without zbar
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.decoded_shapes = []
+
+    def _decode(self, gray):
+        self.decoded_shapes.append(gray.shape)
+        ys, xs = np.nonzero(gray == 255)
+        if not len(xs):
+            return []
+        x, y = int(xs.min()), int(ys.min())
+        rect = (x, y, int(xs.max()) - x + 1, int(ys.max()) - y + 1)
+        return [SimpleNamespace(data=b"ITEM-42", rect=rect)]
+
+
+def _frame(with_code):
+    frame = np.zeros((480, 640), dtype=np.uint8)
+    if with_code:
+        frame[200:260, 300:360] = 255
+    return frame
+
+
+def test_every_frame_is_searched_while_nothing_is_tracked():
+    scanner = FakeDecodeScanner(full_search_every=5)
+    for _ in range(7):
+        assert scanner.scan(_frame(False), timestamp=0.0) == ([], [])
+    assert scanner.full_searches == 7
+    assert scanner.roi_searches == 0
+
+
+def test_code_that_stops_between_full_searches_is_read():
+    # A box slides in and settles on the 3rd analyzed frame, which is not a
+    # periodic full-search frame
+    scanner = FakeDecodeScanner(full_search_every=5)
+    scanner.scan(_frame(False), timestamp=0.0)
+    scanner.scan(_frame(False), timestamp=0.1)
+    new_codes, detections = scanner.scan(_frame(True), timestamp=0.2)
+    assert new_codes == ["ITEM-42"]
+    assert detections == [("ITEM-42", (300, 200, 60, 60))]
+
+
+def test_tracked_codes_are_rechecked_in_their_region():
+    scanner = FakeDecodeScanner(full_search_every=5)
+    for index in range(10):
+        new_codes, detections = scanner.scan(_frame(True), timestamp=index * 0.1)
+        assert [text for text, _ in detections] == ["ITEM-42"]
+        assert new_codes == (["ITEM-42"] if index == 0 else [])
+    # First frame plus every 5th frame are full searches, the rest only decode the region
+    assert scanner.full_searches == 3
+    assert scanner.roi_searches == 7
+    assert all(shape[0] < 480 for shape in scanner.decoded_shapes if shape != (480, 640))
+
+
+def test_lost_code_falls_back_to_full_searches():
+    scanner = FakeDecodeScanner(full_search_every=5, track_ttl=0.5)
+    scanner.scan(_frame(True), timestamp=0.0)
+    scanner.scan(_frame(False), timestamp=1.0)  # Region search, track expires
+    full_searches = scanner.full_searches
+    scanner.scan(_frame(False), timestamp=1.1)
+    scanner.scan(_frame(False), timestamp=1.2)
+    assert scanner.full_searches == full_searches + 2
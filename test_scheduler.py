@@ -0,0 +1,41 @@
+import numpy as np
+
+from change_gate import FrameChangeGate
+from scheduler import AnalyzerScheduler
+
+
+def _frames():
+    still = np.full((72, 128, 3), 40, dtype=np.uint8)
+    moved = still.copy()
+    moved[:, 64:] = 220
+    return still, moved
+
+
+def test_every_task_sees_a_change_once():
+    still, moved = _frames()
+    scheduler = AnalyzerScheduler(frame_budget_ms=1000.0, change_gate=FrameChangeGate(threshold=6.0))
+    seen = {"fast": [], "slow": []}
+    scheduler.add("fast", lambda frame: seen["fast"].append(int(frame[0, -1, 0])), priority=0)
+    slow = scheduler.add("slow", lambda frame: seen["slow"].append(int(frame[0, -1, 0])), priority=1, rate_hz=0.01)
+
+    scheduler.run(still)
+    # The change arrives while the slow task is not due; the fast one takes
+    # the gate's change and the scene then stays the same
+    scheduler.run(moved)
+    slow.last_run = None  # Due again
+    scheduler.run(moved)
+    scheduler.run(moved)
+
+    assert seen["fast"] == [40, 220]
+    assert seen["slow"] == [40, 220]
+    assert slow.skipped["rate"] == 2
+
+
+def test_unchanged_scene_is_skipped():
+    still, _ = _frames()
+    scheduler = AnalyzerScheduler(frame_budget_ms=1000.0, change_gate=FrameChangeGate(threshold=6.0))
+    task = scheduler.add("qr", lambda frame: None)
+    for _ in range(5):
+        scheduler.run(still)
+    assert task.run_count == 1
+    assert task.skipped["unchanged"] == 4
@@ -0,0 +1,65 @@
+import pytest
+
+from text_index import NearDuplicateIndex, within_one_edit
+
+
+@pytest.mark.parametrize("first,second", [
+    ("ABC12", "ABC13"),
+    ("SKU 4411", "SKU 4417"),
+    ("Lot 12345", "Lot 12346"),
+    ("Lot 12345", "Lot 1234"),
+    ("LOT 48213 EXP 2027-03", "LOT 48213 EXP 2027-08"),
+    ("Net wt. 500 g", "NET WT 500g"),
+])
+def test_one_character_errors_are_duplicates(first, second):
+    index = NearDuplicateIndex()
+    entry, is_new = index.add(first)
+    assert is_new
+    duplicate, is_new = index.add(second)
+    assert not is_new
+    assert duplicate is entry
+    assert entry["hits"] == 2
+
+
+@pytest.mark.parametrize("first,second", [
+    ("ABC12", "XYZ98"),
+    ("SKU 4411", "SKU 4477"),
+    ("on", "ok"),
+    ("Best before 2026-01-01", "Made in Portugal"),
+])
+def test_different_texts_are_kept(first, second):
+    index = NearDuplicateIndex()
+    index.add(first)
+    _, is_new = index.add(second)
+    assert is_new
+    assert len(index) == 2
+
+
+def test_within_one_edit():
+    assert within_one_edit("abc", "abc")
+    assert within_one_edit("abc", "abd")
+    assert within_one_edit("abc", "ab")
+    assert within_one_edit("abc", "xabc")
+    assert not within_one_edit("abc", "acb")
+    assert not within_one_edit("abc", "a")
+
+
+def test_hits_are_recorded_in_the_session(tmp_path):
+    from scanner_core import ScannerCore
+    from session_store import session_summary
+
+    core = ScannerCore(str(tmp_path / "scan.db"), metrics_port=None)
+    try:
+        core.new_session("test")
+        assert core.add_text("Lot 12345")
+        assert not core.add_text("Lot 12346")
+        assert not core.add_text("LOT 12345")
+        assert core.add_text("SKU 4411")
+        core.session_store.flush()
+        connection = core.session_store.reader()
+        summary = session_summary(connection, core.session_store.session_id)
+        connection.close()
+    finally:
+        core.shutdown()
+    assert summary["counts"] == {"text": 2, "text_hit": 2}
+    assert summary["text_hits"] == {"Lot 12345": 2}
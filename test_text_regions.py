@@ -0,0 +1,29 @@
+import cv2
+import pytest
+
+from benchmark import synthetic_frame
+from text_regions import find_text_regions
+
+
+def _covers(box, x, y):
+    bx, by, bw, bh = box
+    return bx <= x < bx + bw and by <= y < by + bh
+
+
+@pytest.mark.parametrize("width,height", [(640, 480), (960, 720), (1280, 720), (1920, 1080), (3840, 2160)])
+def test_finds_both_text_lines(width, height):
+    gray = cv2.cvtColor(synthetic_frame(width, height), cv2.COLOR_BGR2GRAY)
+    boxes = find_text_regions(gray)
+    assert boxes
+    unit = width / 640.0
+    # Middle of the first word on each line drawn by synthetic_frame
+    for x, y in [(30 * unit, 52 * unit), (30 * unit, 102 * unit)]:
+        assert any(_covers(box, int(x), int(y)) for box in boxes), (x, y, boxes)
+    for x, y, w, h in boxes:
+        assert 0 <= x and 0 <= y and x + w <= width and y + h <= height
+
+
+def test_blank_frame_has_no_text():
+    gray = cv2.cvtColor(synthetic_frame(640, 480), cv2.COLOR_BGR2GRAY)
+    gray[:] = 127
+    assert find_text_regions(gray) == []
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+import serial
+
+from fake_scale import FakeScale
+from weight_reader import WeightReader, parse_weight
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.mark.parametrize("line, expected", [
+    (b"1.25\r\n", 1.25),
+    ("ST,GS, 12.50 kg", 12.5),
+    ("US,NT,+ 0.75kg", 0.75),
+    ("250 g", 0.25),
+    ("2 lb", 0.90718474),
+    ("-0.2", -0.2),
+])
+def test_parse_weight_reads_prefixes_and_units(line, expected):
+    assert parse_weight(line) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("line", [b"", b"\xff\xfe", "ST,GS,", "12.5 oz", "abc", "1.2.3", "-1.0", "1500", "nan"])
+def test_parse_weight_rejects_garbage_and_out_of_range(line):
+    assert parse_weight(line) is None
+
+
+def test_poll_mode_reads_the_scale():
+    with FakeScale(weight=2.5, mode="poll") as scale:
+        readings = []
+        reader = WeightReader(scale.port, mode="poll", poll_interval=0.05, read_timeout=0.2)
+        reader.on_reading = lambda weight, timestamp: readings.append(weight)
+        reader.start()
+        try:
+            assert _wait_until(lambda: reader.latest_weight() == 2.5)
+            scale.set_weight(3.75)
+            assert _wait_until(lambda: reader.latest_weight() == 3.75)
+            assert scale.requests >= 2
+            assert reader.connected
+            assert readings[0] == 2.5
+        finally:
+            reader.stop()
+
+
+def test_stream_mode_reads_unrequested_lines():
+    with FakeScale(weight=1.5, mode="stream", interval=0.05, line_format="ST,GS,{weight:.2f}kg\r\n") as scale:
+        reader = WeightReader(scale.port, mode="stream", read_timeout=0.2).start()
+        try:
+            assert _wait_until(lambda: reader.latest_weight() == 1.5)
+            assert scale.requests == 0
+        finally:
+            reader.stop()
+
+
+def test_silent_scale_keeps_the_reading_until_it_is_too_old():
+    with FakeScale(weight=4.0, mode="poll") as scale:
+        reader = WeightReader(scale.port, mode="poll", poll_interval=0.05, read_timeout=0.1).start()
+        try:
+            assert _wait_until(lambda: reader.latest_weight() == 4.0)
+            scale.silent = True
+            time.sleep(0.4)
+            assert reader.latest_weight() == 4.0
+            assert reader.latest_weight(max_age=0.2) is None
+            assert reader.stats()["parse_errors"] == 0
+        finally:
+            reader.stop()
+
+
+def test_garbage_line_is_counted_and_ignored():
+    with FakeScale(weight=5.0, mode="poll") as scale:
+        reader = WeightReader(scale.port, mode="poll", poll_interval=0.05, read_timeout=0.2).start()
+        try:
+            assert _wait_until(lambda: reader.latest_weight() == 5.0)
+            scale.set_weight(6.0)
+            scale.garbage = b"#@!ERR\r\n"
+            assert _wait_until(lambda: reader.stats()["parse_errors"] == 1)
+            assert "ERR" in reader.stats()["last_error"]
+            assert _wait_until(lambda: reader.latest_weight() == 6.0)
+        finally:
+            reader.stop()
+
+
+def test_missing_port_is_retried_with_backoff():
+    with FakeScale(weight=7.0, mode="poll") as scale:
+        attempts = []
+
+        def flaky_port(port, baudrate, timeout):
+            # The scale only shows up on the fourth attempt
+            attempts.append(time.time())
+            if len(attempts) < 4:
+                raise serial.SerialException(f"could not open port {port}")
+            return serial.Serial(scale.port, baudrate, timeout=timeout)
+
+        reader = WeightReader("/dev/missing-scale", mode="poll", poll_interval=0.05, read_timeout=0.2,
+                              reconnect_delay=0.05, max_reconnect_delay=0.5, serial_factory=flaky_port).start()
+        try:
+            assert _wait_until(lambda: reader.latest_weight() == 7.0)
+            assert len(attempts) == 4
+            gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+            assert gaps[0] >= 0.04 and gaps[1] >= 0.09 and gaps[2] >= 0.18
+            assert reader.connected
+        finally:
+            reader.stop()
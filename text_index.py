@@ -0,0 +1,171 @@
+import re
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def normalize_text(text):
+    # Case, accents' compatibility forms, punctuation and whitespace runs are
+    # the usual OCR jitter between two reads of the same label
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def ngrams(normalized, n=2):
+    padded = f" {normalized} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def deletions(normalized):
+    # The text and every variant with one character removed. Two texts at most
+    # one substitution, insertion or deletion apart always share a variant.
+    return {normalized} | {normalized[:i] + normalized[i + 1:] for i in range(len(normalized))}
+
+
+def within_one_edit(a, b):
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class NearDuplicateIndex:
+    # Every distinct text seen in a session, with MinHash LSH over character
+    # n-grams for sublinear near-duplicate lookups. Texts that normalize to
+    # the same string match through a dict; otherwise texts sharing a band of
+    # their MinHash signature are candidates, and a candidate is a duplicate
+    # when the n-gram Jaccard similarity is at least threshold. A duplicate
+    # adds a hit to the entry seen first instead of creating a new one.
+    #
+    # One changed character costs up to two of the few bigrams of a short
+    # label: ABC12 and ABC13 are only 0.5 similar, "lot 12345" and "lot 12346"
+    # 0.67. Texts of min_short to short_length characters are therefore also
+    # duplicates when they are at most one edit apart, found through an index
+    # of their one-character deletions. With bands * rows hashes, texts at
+    # similarity s become candidates with probability 1 - (1 - s**rows)**bands:
+    # 99.9% at 0.7 for 16 bands of 3.
+    def __init__(self, threshold=0.7, bands=16, rows=3, n=2, seed=1, short_length=16, min_short=4):
+        self.threshold = threshold
+        self.short_length = short_length
+        self.min_short = min_short  # "on" and "ok" are different words, not an OCR error
+        self.bands = bands
+        self.rows = rows
+        self.n = n
+        rng = np.random.default_rng(seed)
+        count = bands * rows
+        # Everything stays below 2**31, so a * h + b never overflows uint64
+        self.perm_a = rng.integers(1, _MERSENNE_PRIME, count, dtype=np.uint64)
+        self.perm_b = rng.integers(0, _MERSENNE_PRIME, count, dtype=np.uint64)
+        self.clear()
+
+    def clear(self):
+        self.entries = []
+        self.exact = {}                                   # normalized text -> entry id
+        self.buckets = [{} for _ in range(self.bands)]    # band key -> [entry ids]
+        self.short = {}                                   # deletion variant -> [short entry ids]
+        self.lookups = 0
+        self.candidates_checked = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def signature(self, grams):
+        hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) % _MERSENNE_PRIME for gram in grams),
+                             dtype=np.uint64, count=len(grams))
+        values = (np.outer(self.perm_a, hashes) + self.perm_b[:, None]) % _MERSENNE_PRIME
+        return values.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def find(self, text):
+        # (entry, similarity) of the closest indexed text, or (None, 0.0)
+        normalized = normalize_text(text)
+        entry, similarity, _, _ = self._find(normalized)
+        return entry, similarity
+
+    def _find(self, normalized):
+        self.lookups += 1
+        entry_id = self.exact.get(normalized)
+        if entry_id is not None:
+            return self.entries[entry_id], 1.0, None, None
+        grams = ngrams(normalized, self.n)
+        keys = self._band_keys(self.signature(grams))
+        best, best_similarity = None, 0.0
+        seen = set()
+        for band, key in enumerate(keys):
+            for candidate_id in self.buckets[band].get(key, ()):
+                if candidate_id in seen:
+                    continue
+                seen.add(candidate_id)
+                self.candidates_checked += 1
+                similarity = jaccard(grams, self.entries[candidate_id]["grams"])
+                if similarity > best_similarity:
+                    best, best_similarity = self.entries[candidate_id], similarity
+        if best is not None and best_similarity >= self.threshold:
+            return best, best_similarity, grams, keys
+        if self._is_short(normalized):
+            for variant in deletions(normalized):
+                for candidate_id in self.short.get(variant, ()):
+                    candidate = self.entries[candidate_id]
+                    if within_one_edit(normalized, candidate["normalized"]):
+                        return candidate, jaccard(grams, candidate["grams"]), grams, keys
+        return None, best_similarity, grams, keys
+
+    def _is_short(self, normalized):
+        return self.min_short <= len(normalized) <= self.short_length
+
+    def add(self, text, timestamp=None):
+        # Returns (entry, is_new); empty texts return (None, False)
+        normalized = normalize_text(text)
+        if not normalized:
+            return None, False
+        timestamp = time.time() if timestamp is None else timestamp
+        entry, _, grams, keys = self._find(normalized)
+        if entry is not None:
+            entry["hits"] += 1
+            entry["last_seen"] = timestamp
+            return entry, False
+
+        entry = {
+            "id": len(self.entries),
+            "text": text,
+            "normalized": normalized,
+            "grams": grams,
+            "first_seen": timestamp,
+            "last_seen": timestamp,
+            "hits": 1,
+        }
+        self.entries.append(entry)
+        self.exact[normalized] = entry["id"]
+        for band, key in enumerate(keys):
+            self.buckets[band].setdefault(key, []).append(entry["id"])
+        if self._is_short(normalized):
+            for variant in deletions(normalized):
+                self.short.setdefault(variant, []).append(entry["id"])
+        return entry, True
+
+    def duplicate_count(self):
+        return sum(entry["hits"] - 1 for entry in self.entries)
+
+    def summary(self):
+        return f"{len(self.entries)} unique texts, {self.duplicate_count()} duplicate reads"
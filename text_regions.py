@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+
+def find_text_regions(gray, max_width=960, min_height=8, min_width=12, min_fill=0.35, max_regions=12, padding=4):
+    # Finds candidate text boxes with a morphological gradient: strokes give
+    # strong local contrast, and a wide closing kernel joins the characters of
+    # a word into one blob. Returns (x, y, w, h) boxes in reading order, in the
+    # coordinates of the gray image that was passed in.
+    height, width = gray.shape[:2]
+    scale = 1.0
+    work = gray
+    if width > max_width:
+        scale = max_width / width
+        work = cv2.resize(gray, (max_width, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+
+    gradient = cv2.morphologyEx(work, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # Glyphs and the gaps between them grow with the resolution, so the
+    # kernel does too: 9 px at 640 wide, 15 px at the 960 px working width
+    kernel_width = max(9, int(round(work.shape[1] / 64.0)))
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 1)))
+    contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    work_height, work_width = work.shape[:2]
+    candidates = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < min_height * scale or w < min_width * scale:
+            continue
+        # Text is wider than tall and, once closed, mostly fills its box; the
+        # stroke edges alone only cover a quarter to a third of it
+        if w < h * 0.8 or h > work_height * 0.5:
+            continue
+        fill = cv2.countNonZero(connected[y:y + h, x:x + w]) / float(w * h)
+        if fill < min_fill:
+            continue
+        candidates.append((w * h, x, y, w, h))
+
+    candidates.sort(reverse=True)
+    boxes = []
+    for _, x, y, w, h in candidates[:max_regions]:
+        x0 = max(0, x - padding)
+        y0 = max(0, y - padding)
+        x1 = min(work_width, x + w + padding)
+        y1 = min(work_height, y + h + padding)
+        boxes.append((
+            int(x0 / scale), int(y0 / scale),
+            min(width, int(np.ceil(x1 / scale))) - int(x0 / scale),
+            min(height, int(np.ceil(y1 / scale))) - int(y0 / scale),
+        ))
+    boxes.sort(key=lambda box: (box[1] // max(1, box[3]), box[0]))
+    return boxes
+
+
+def crop_regions(gray, boxes):
+    # Copies the crops so only the boxes are sent to the OCR workers
+    return [(box, np.ascontiguousarray(gray[box[1]:box[1] + box[3], box[0]:box[0] + box[2]])) for box in boxes]
+
+
+def prepare_crop(crop, min_height=32):
+    # Tesseract reads small glyphs poorly, so enlarge short crops
+    # while keeping their aspect ratio
+    if crop.shape[0] < min_height:
+        factor = min_height / float(crop.shape[0])
+        crop = cv2.resize(crop, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+    return crop
+
+
+def draw_regions(frame, boxes, color=(0, 255, 0)):
+    for x, y, w, h in boxes:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 1)
+    return frame
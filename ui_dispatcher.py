@@ -0,0 +1,134 @@
+import queue
+import tkinter as tk
+from collections import deque
+
+
+class LogView:
+    # Text widget used as a fixed-size ring: old lines are evicted once
+    # max_lines is reached, so inserts cost the same all shift long
+    def __init__(self, text_widget, max_lines=500):
+        self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.line_count = 0
+
+    def append(self, lines):
+        if not lines:
+            return
+        if len(lines) > self.max_lines:
+            lines = lines[-self.max_lines:]
+        # Only follow the output if the user has not scrolled up
+        at_bottom = self.text_widget.yview()[1] >= 0.999
+        self.text_widget.insert(tk.END, "".join(line + "\n" for line in lines))
+        self.line_count += len(lines)
+        excess = self.line_count - self.max_lines
+        if excess > 0:
+            self.text_widget.delete("1.0", f"{excess + 1}.0")
+            self.line_count -= excess
+        if at_bottom:
+            self.text_widget.see(tk.END)
+
+
+class HistoryView:
+    # Shows one page of a bounded history in a label, newest first. Adding an
+    # item only marks the view dirty; the page is rendered at most once per
+    # dispatcher flush and never joins more than page_size items.
+    def __init__(self, label, maxlen=200, page_size=10, separator="\n"):
+        self.label = label
+        self.items = deque(maxlen=maxlen)
+        self.page_size = page_size
+        self.separator = separator
+        self.page = 0
+        self.dirty = False
+
+    def add(self, item):
+        self.items.append(item)
+        self.dirty = True
+
+    def clear(self):
+        self.items.clear()
+        self.page = 0
+        self.dirty = True
+
+    def page_count(self):
+        return max(1, (len(self.items) + self.page_size - 1) // self.page_size)
+
+    def older(self):
+        if self.page + 1 < self.page_count():
+            self.page += 1
+            self.render()
+
+    def newer(self):
+        if self.page > 0:
+            self.page -= 1
+            self.render()
+
+    def render(self):
+        self.dirty = False
+        end = len(self.items) - self.page * self.page_size
+        start = max(0, end - self.page_size)
+        page_items = [self.items[index] for index in range(end - 1, start - 1, -1)]
+        text = self.separator.join(page_items)
+        if self.page_count() > 1:
+            text += f"{self.separator}(page {self.page + 1}/{self.page_count()})"
+        self.label.config(text=text)
+
+
+class UIDispatcher:
+    # Collects UI updates from the pipeline and applies them in batches at
+    # most max_rate_hz times per second. post_log() and set_text() are safe
+    # to call from any thread; widgets are only touched from the Tk loop.
+    def __init__(self, root, log_view, max_rate_hz=10, max_batch=1000):
+        self.root = root
+        self.log_view = log_view
+        self.interval_ms = max(1, int(1000 / max_rate_hz))
+        self.max_batch = max_batch
+        self.updates = queue.Queue()
+        self.history_views = []
+        self.running = False
+        self.flush_count = 0
+
+    def add_history(self, history_view):
+        self.history_views.append(history_view)
+        return history_view
+
+    def post_log(self, message):
+        self.updates.put(("log", None, message.rstrip("\n")))
+
+    def set_text(self, widget, text):
+        # Only the last text set for a widget within one flush is applied
+        self.updates.put(("text", widget, text))
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.root.after(self.interval_ms, self._tick)
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _tick(self):
+        if not self.running:
+            return
+        self.flush()
+        self.root.after(self.interval_ms, self._tick)
+
+    def flush(self):
+        lines = []
+        texts = {}
+        for _ in range(self.max_batch):
+            try:
+                kind, widget, value = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                lines.extend(value.split("\n"))
+            else:
+                texts[widget] = value
+        self.log_view.append(lines)
+        for widget, text in texts.items():
+            widget.config(text=text)
+        for history_view in self.history_views:
+            if history_view.dirty:
+                history_view.render()
+        self.flush_count += 1
@@ -0,0 +1,157 @@
+import math
+import re
+import threading
+import time
+
+import serial
+
+# Optional status prefix (e.g. "ST,GS,"), signed number, optional unit
+WEIGHT_PATTERN = re.compile(r'^(?:[A-Z]{2},)*\s*([+-]?\s*\d+(?:\.\d+)?)\s*(kg|g|lb|lbs)?\s*$', re.IGNORECASE)
+UNIT_TO_KG = {None: 1.0, 'kg': 1.0, 'g': 0.001, 'lb': 0.45359237, 'lbs': 0.45359237}
+
+
+def parse_weight(raw, min_weight=-0.5, max_weight=1000.0):
+    # Parses one scale line into kilograms, None when it is not a valid reading
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8', errors='replace')
+    match = WEIGHT_PATTERN.match(raw.strip())
+    if match is None:
+        return None
+    weight = float(match.group(1).replace(' ', '')) * UNIT_TO_KG[match.group(2).lower() if match.group(2) else None]
+    if not math.isfinite(weight) or not min_weight <= weight <= max_weight:
+        return None
+    return weight
+
+
+class WeightReader:
+    # Talks to the serial scale on a background thread. In "poll" mode it
+    # sends the command byte every poll_interval seconds and reads one line;
+    # in "stream" mode it reads the lines a continuously sending scale
+    # produces. The newest valid reading is cached with its timestamp, so the
+    # UI can read it without ever blocking. Lost ports are reopened.
+    def __init__(self, port, baudrate=9600, mode="poll", command=b'W', poll_interval=1.0,
+                 read_timeout=0.5, reconnect_delay=1.0, max_reconnect_delay=30.0,
+                 min_weight=-0.5, max_weight=1000.0, serial_factory=None):
+        if mode not in ("poll", "stream"):
+            raise ValueError(f"Unknown weight reader mode: {mode}")
+        self.port = port
+        self.baudrate = baudrate
+        self.mode = mode
+        self.command = command
+        self.poll_interval = poll_interval
+        self.read_timeout = read_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.min_weight = min_weight
+        self.max_weight = max_weight
+        self.serial_factory = serial_factory if serial_factory is not None else serial.Serial
+        self.connection = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.weight = None
+        self.timestamp = None
+        self.readings_count = 0
+        self.parse_errors = 0
+        self.reconnects = 0
+        self.last_error = None
+        self.on_reading = None  # Optional callback(weight, timestamp), runs on the reader thread
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="WeightReader", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.read_timeout + 1.0)
+            self.thread = None
+        self._close()
+
+    @property
+    def connected(self):
+        return self.connection is not None
+
+    def latest(self, max_age=None):
+        # Returns (weight, timestamp); (None, None) when there is no reading
+        # or it is older than max_age seconds
+        with self.lock:
+            weight, timestamp = self.weight, self.timestamp
+        if timestamp is None or (max_age is not None and time.time() - timestamp > max_age):
+            return None, None
+        return weight, timestamp
+
+    def latest_weight(self, max_age=None):
+        return self.latest(max_age)[0]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "connected": self.connected,
+                "readings": self.readings_count,
+                "parse_errors": self.parse_errors,
+                "reconnects": self.reconnects,
+                "last_error": self.last_error,
+            }
+
+    def _open(self):
+        self.connection = self.serial_factory(self.port, self.baudrate, timeout=self.read_timeout)
+        if self.mode == "stream":
+            self.connection.reset_input_buffer()
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.connection = None
+
+    def _store(self, line):
+        weight = parse_weight(line, self.min_weight, self.max_weight)
+        now = time.time()
+        with self.lock:
+            if weight is None:
+                self.parse_errors += 1
+                self.last_error = f"Invalid weight data: {line!r}"
+                return
+            self.weight = weight
+            self.timestamp = now
+            self.readings_count += 1
+        if self.on_reading is not None:
+            self.on_reading(weight, now)
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self.stop_event.is_set():
+            if self.connection is None:
+                try:
+                    self._open()
+                    delay = self.reconnect_delay
+                except (serial.SerialException, OSError) as e:
+                    with self.lock:
+                        self.last_error = str(e)
+                    # Back off so a missing scale does not spin the CPU
+                    self.stop_event.wait(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+                    continue
+            try:
+                if self.mode == "poll":
+                    started = time.time()
+                    self.connection.write(self.command)
+                    line = self.connection.readline()
+                    if line:
+                        self._store(line)
+                    self.stop_event.wait(max(0.0, self.poll_interval - (time.time() - started)))
+                else:
+                    line = self.connection.readline()
+                    if line:
+                        self._store(line)
+            except (serial.SerialException, OSError) as e:
+                with self.lock:
+                    self.last_error = str(e)
+                    self.reconnects += 1
+                self._close()